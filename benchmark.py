@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+from matplotlib.dates import date2num
+from utide import constit_index_dict
+import tide_io
+import tide_harmonic
+
+
+
+def syntheticSeries(days=365, freq='min'):
+    '''Synthetic water level record with M2 and K1 signals'''
+
+    periods = int(pd.Timedelta(days=days) / pd.Timedelta('1' + freq))
+    time_index = pd.date_range('2019-01-01', periods=periods, freq=freq)
+    hours = (time_index - time_index[0]) / pd.Timedelta(hours=1)
+    hours = np.asarray(hours, dtype='float64')
+    depth = 1.2 * np.cos(2 * np.pi * hours / 12.4206) + 0.4 * np.cos(2 * np.pi * hours / 23.9345) + 2.0
+
+    return pd.DataFrame({'Time':time_index, 'Depth':np.round(depth, 4)})
+
+
+def benchOutput(data):
+    '''Write time and file size of every available output format against text'''
+
+    rows = []
+
+    with tempfile.TemporaryDirectory() as folder:
+        for fmt in tide_io.OUTPUT_FORMATS:
+            start = time.perf_counter()
+            try:
+                path = tide_io.writeTable(data, os.path.join(folder, 'bench.txt'), fmt, '\t')
+            except ImportError:
+                rows.append((fmt, None, None))
+                continue
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+            rows.append((fmt, elapsed, size))
+
+    text_time, text_size = rows[0][1], rows[0][2]
+
+    print('Output formats, {} rows'.format(len(data)))
+    print('{:<10}{:>12}{:>14}{:>10}{:>10}'.format('format', 'write (s)', 'size (bytes)', 'speedup', 'size %'))
+
+    for fmt, elapsed, size in rows:
+        if elapsed is None:
+            print('{:<10}{:>12}'.format(fmt, 'n/a'))
+        else:
+            print('{:<10}{:>12.3f}{:>14}{:>10.1f}{:>10.1f}'.format(fmt, elapsed, size, text_time / elapsed,
+                                                                 100 * size / text_size))
+
+
+def syntheticModel(lat=-3.0):
+    '''Harmonic model with the main semidiurnal and diurnal constituents'''
+
+    names = ['M2', 'S2', 'N2', 'K2', 'K1', 'O1', 'P1', 'Q1', 'M4', 'MS4']
+    amplitude = [1.2, 0.45, 0.25, 0.12, 0.4, 0.3, 0.13, 0.06, 0.03, 0.02]
+    phase = [120.0, 150.0, 100.0, 148.0, 300.0, 280.0, 298.0, 260.0, 40.0, 75.0]
+    reftime = float(date2num(np.datetime64('2019-01-01')))
+
+    return {'name':names, 'lind':np.array([constit_index_dict[name] for name in names]),
+            'A':np.array(amplitude), 'g':np.array(phase), 'mean':2.0, 'slope':0.0,
+            'reftime':reftime, 'lat':lat}
+
+
+def benchNodal(days, step=30.0, tolerances=(1e-2, 1e-4, 1e-6)):
+    '''Synthesis with tabulated nodal corrections (from a step of days) against the full computation'''
+
+    model = syntheticModel()
+    time_num = model['reftime'] + np.arange(0, days, 1 / 24)
+
+    start = time.perf_counter()
+    full = tide_harmonic.synthesize(model, time_num, step=None)
+    full_time = time.perf_counter() - start
+
+    print('Nodal corrections, {} hourly predictions'.format(len(time_num)))
+    print('{:<12}{:>10}{:>12}{:>12}{:>14}{:>14}'.format('tolerance', 'step (d)', 'time (s)', 'speedup', 'estimate',
+                                                          'max error'))
+    print('{:<12}{:>10}{:>12.3f}'.format('full', '', full_time))
+
+    for tolerance in tolerances:
+        table = tide_harmonic.nodalTable(model, time_num[0], time_num[-1], step, tolerance)
+        start = time.perf_counter()
+        level = tide_harmonic.synthesize(model, time_num, step, tolerance)
+        elapsed = time.perf_counter() - start
+        error = np.max(np.abs(level - full))
+        print('{:<12}{:>10.3f}{:>12.3f}{:>12.1f}{:>14.2e}{:>14.2e}'.format(tolerance, table['step'], elapsed,
+                                                                       full_time / elapsed, table['error'], error))
+
+
+def benchTimes(days, points=10 ** 6):
+    '''Prediction at random timestamps written alongside the input, engine and file throughput'''
+
+    model = syntheticModel()
+    rng = np.random.default_rng(0)
+    times = pd.Timestamp('2019-01-01') + pd.to_timedelta(np.sort(rng.random(points)) * days, unit='D')
+
+    start = time.perf_counter()
+    tide_harmonic.synthesize(model, date2num(times.values))
+    engine = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'pings.txt')
+        pd.DataFrame({'Time':times.strftime('%Y-%m-%d %H:%M:%S.%f'), 'Depth':rng.random(points)}).to_csv(
+            path, sep='\t', index=False)
+
+        start = time.perf_counter()
+        records = tide_io.streamRecords(path, '\t', 0, 0, 'Time')
+        tide_io.writeRecords(tide_harmonic.predictRecords(model, records), tide_io.siblingPath(path, '_tide'),
+                             '\t', 0)
+        stream = time.perf_counter() - start
+
+    print('Prediction at {} random times'.format(points))
+    print('{:<10}{:>12}{:>16}'.format('', 'time (s)', 'points/s'))
+    print('{:<10}{:>12.3f}{:>16,.0f}'.format('engine', engine, points / engine))
+    print('{:<10}{:>12.3f}{:>16,.0f}'.format('file', stream, points / stream))
+
+
+def main():
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    data = syntheticSeries(days)
+
+    benchOutput(data)
+    benchNodal(days)
+    benchTimes(days)
+
+
+if __name__ == '__main__':
+    main()
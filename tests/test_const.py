@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tide_const
+
+
+def testRayleigh():
+    '''A 30 day hourly record fits M2 and S2 but not the pairs closer than one cycle per record'''
+
+    selected, dropped = tide_const.selectConstituents(30 * 24, 1.0)
+
+    assert 'M2' in selected and 'S2' in selected and 'K1' in selected
+    assert 'P1' not in selected and 'K2' not in selected
+    assert 'Rayleigh' in dropped['P1'] and 'K1' in dropped['P1']
+    assert 'Rayleigh' in dropped['K2'] and 'S2' in dropped['K2']
+
+
+def testNyquistAndLists():
+    '''Constituents above the Nyquist frequency are dropped, include and exclude override the Rayleigh test'''
+
+    selected, dropped = tide_const.selectConstituents(30 * 24, 3.0, include=['P1', 'XX'], exclude=['S2'])
+
+    assert 'M8' not in selected and 'Nyquist' in dropped['M8']
+    assert 'P1' in selected
+    assert dropped['S2'] == 'excluded by user'
+    assert dropped['XX'] == 'unknown constituent'
+
+
+def testTtideNames():
+    '''T Tide names are padded to 4 characters and still name the same constituents'''
+
+    names, dropped = tide_const.selectConstituents(365 * 24, 1.0)
+    padded = tide_const.ttideNames(names)
+
+    assert all(len(name) == 4 for name in padded)
+    assert [name.strip() for name in padded] == names
+    assert set(name.strip() for name in padded) <= set(tide_const.const.name)
+    assert tide_const.ttideNames(['M2', 'MSF', '2MK5']) == ['M2  ', 'MSF ', '2MK5']
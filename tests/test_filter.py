@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tide_filter
+
+
+# Periods (hours) and amplitudes of M2, S2 and K1
+TIDES = ((12.4206012, 1.0), (12.0, 0.5), (23.9344696, 0.4))
+RATE = 0.1
+
+
+def trendSeries(interval=1.0, days=120, mean=2.0):
+    '''M2, S2 and K1 on a mean level rising RATE per year, sampled every interval hours'''
+
+    times = pd.date_range('2019-01-01', periods=int(days * 24 / interval), freq='{}min'.format(int(interval * 60)))
+    hours = np.arange(len(times)) * interval
+    level = mean + RATE * hours / (24 * 365.25)
+    depth = level + sum(A * np.cos(2 * np.pi * hours / period) for period, A in TIDES)
+
+    return times, depth, level
+
+
+@pytest.mark.parametrize('name', ['Godin', 'Doodson X0'])
+def testTidesRemoved(name):
+    '''The filters leave the mean level and its trend, M2, S2 and K1 are removed'''
+
+    times, depth, level = trendSeries()
+    filtered, table, rate = tide_filter.meanSeaLevel(times, depth, 1.0, name)
+    valid = ~np.isnan(filtered)
+
+    assert valid.sum() > 0.9 * len(depth)
+    assert np.max(np.abs(filtered[valid] - level[valid])) < 0.02
+    assert abs(rate - RATE) < 0.01
+    assert np.nanmax(np.abs(table['MSL_detrended'])) < 0.01
+
+
+@pytest.mark.parametrize('name', ['Godin', 'Doodson X0', 'Low-pass'])
+@pytest.mark.parametrize('interval', [1.0, 0.25])
+def testKernel(name, interval):
+    '''Weights are symmetric and sum to one, so a constant level passes unchanged'''
+
+    weights = tide_filter.kernel(name, interval)
+
+    assert np.allclose(weights, weights[::-1])
+    assert abs(weights.sum() - 1) < 1e-12
+
+
+def testDoodsonInterval():
+    '''Doodson X0 needs samples on the hour'''
+
+    with pytest.raises(ValueError):
+        tide_filter.kernel('Doodson X0', 0.4)
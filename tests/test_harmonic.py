@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from matplotlib.dates import date2num
+from utide import solve
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import tide_solve
+import tide_harmonic
+
+
+LAT = -2.7
+
+
+def m2Series(start='2019-01-01', end='2019-03-01', A=1.5, g=120.0, mean=2.0):
+    '''
+    Half hourly M2 tide of Greenwich phase g from the mean longitudes of the moon (s) and
+    sun (h) of the Astronomical Almanac, V = 2 (T + h - s) with T = 180 + 15 UT hours,
+    without nodal corrections
+    '''
+
+    times = pd.date_range(start, end, freq='30min')
+    jd = times.to_julian_date().values
+    centuries = (jd - 2451545.0) / 36525
+    s = 218.3164477 + 481267.88123421 * centuries
+    h = 280.46646 + 36000.76983 * centuries
+    hours = 24 * ((jd - 0.5) % 1)
+    V = 2 * (180 + 15 * hours + h - s)
+
+    return times, A * np.cos(np.deg2rad(V - g)) + mean
+
+
+def testM2Phase():
+    '''Greenwich phase of M2 within its nodal phase correction (below 2.5 degrees)'''
+
+    times, depth = m2Series()
+    coef = tide_solve.utideSolve(date2num(times.to_pydatetime()), depth, LAT, ['M2'])
+
+    assert abs((coef.g[0] - 120.0 + 180) % 360 - 180) < 2.5
+    assert abs(coef.A[0] - 1.5) < 0.06
+
+
+def testDatetimeReference():
+    '''Day numbers give the fit and prediction of utide solving on the datetimes themselves'''
+
+    times, depth = m2Series()
+    time_num = date2num(times.to_pydatetime())
+    coef = tide_solve.utideSolve(time_num, depth, LAT, ['M2', 'S2', 'K1'])
+    reference = solve(times.values, depth, lat=LAT, constit=['M2', 'S2', 'K1'], trend=False, method='robust',
+                      verbose=False)
+
+    assert np.allclose(coef.g, reference.g, atol=1e-6)
+    assert np.allclose(coef.A, reference.A, atol=1e-9)
+
+    model = tide_harmonic.harmonicModel(coef, 'U Tide', LAT)
+    predicted = tide_solve.utideRun(time_num, depth, LAT, ['M2', 'S2', 'K1'], time_num)['prediction']
+
+    assert abs(model['reftime'] - np.mean(time_num)) < 1e-6
+    assert np.max(np.abs(tide_harmonic.synthesize(model, time_num) - predicted)) < 1e-4
+
+
+def testNodalTable():
+    '''Tabulated nodal corrections stay within NODAL_TOLERANCE of the full computation over years'''
+
+    model = benchmark.syntheticModel(LAT)
+    time_num = model['reftime'] + np.arange(0, 3 * 365.25, 1 / 24)
+
+    full = tide_harmonic.synthesize(model, time_num, step=None)
+    tabulated = tide_harmonic.synthesize(model, time_num)
+
+    assert np.max(np.abs(tabulated - full)) <= tide_harmonic.NODAL_TOLERANCE
+
+
+def testRegularBlocks():
+    '''Block phasor synthesis matches the full computation at the same regular times'''
+
+    model = benchmark.syntheticModel(LAT)
+    start = model['reftime'] - 40.3
+    # Partial last blocks (n not a multiple of the block length), a single time and an unreferenced model
+    cases = [(model, 1 / 1440, 60 * 24 * 3 + 17), (model, 1 / 24, 24 * 400 + 5), (model, 1 / 24, 1),
+             (dict(model, reftime=None), 0.25, 4 * 90 + 3)]
+
+    for case, step, n in cases:
+        regular = tide_harmonic.synthesizeRegular(case, start, step, n)
+        full = tide_harmonic.synthesize(case, start + step * np.arange(n), step=None)
+
+        assert len(regular) == n
+        assert np.max(np.abs(regular - full)) < 1e-6
+
+
+def testBootstrap():
+    '''Bootstrap intervals are reproducible across worker counts and cover the true M2'''
+
+    truth = benchmark.syntheticModel(LAT)
+    truth = dict(truth, name=['M2'], lind=truth['lind'][:1], A=np.array([1.5]), g=np.array([120.0]))
+    time_num = truth['reftime'] + np.arange(0, 60, 1 / 24)
+    noise = np.random.default_rng(7).normal(0, 0.3, len(time_num))
+    observed = tide_harmonic.synthesize(truth, time_num) + noise
+
+    coef = tide_solve.utideSolve(time_num, observed, LAT, ['M2'])
+    model = tide_harmonic.harmonicModel(coef, 'U Tide', LAT)
+    serial = tide_harmonic.confidenceIntervals(model, time_num, observed, realizations=60, seed=5, workers=1)
+    parallel = tide_harmonic.confidenceIntervals(model, time_num, observed, realizations=60, seed=5, workers=2)
+
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert 0 < serial['A_ci']['M2'] < 0.1 and 0 < serial['g_ci']['M2'] < 5
+    assert abs(serial['A']['M2'] - 1.5) <= serial['A_ci']['M2']
+    assert abs((serial['g']['M2'] - 120.0 + 180) % 360 - 180) <= serial['g_ci']['M2']
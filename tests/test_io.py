@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tide_io
+
+
+class Planted:
+    '''Object that leaves a marker file behind when unpickled'''
+
+    def __init__(self, marker):
+
+        self.marker = marker
+
+    def __reduce__(self):
+
+        return (open, (self.marker, 'w'))
+
+
+def loggerFolder(folder):
+    '''Folder with one small logger file, its path and its parsed frame'''
+
+    path = os.path.join(str(folder), 'station.txt')
+    times = pd.date_range('2019-01-01', periods=48, freq='60min')
+    frame = pd.DataFrame({'Time':times.strftime('%d/%m/%Y %H:%M:%S'), 'Depth':np.arange(48) * 0.5,
+                          'Note':['ok' if i % 5 else '' for i in range(48)]})
+    frame.to_csv(path, sep='\t', index=False)
+
+    return path, tide_io.readFile(path, '\t', 0, 0)
+
+
+def testFrameRoundTrip(tmp_path):
+    '''Text with missing values, datetimes and numbers come back as they were saved'''
+
+    frame = pd.DataFrame({'Time':pd.date_range('2019-01-01', periods=4, freq='15min'),
+                          'Depth':[1.5, np.nan, 2.25, 3.0], 'Count':np.arange(4, dtype='int64'),
+                          'Flag':np.array(['a', np.nan, 'c', None], dtype=object)})
+    path = str(tmp_path / 'frame.npz')
+    tide_io.saveFrame(frame, path)
+    loaded = tide_io.loadFrame(path)
+
+    assert list(loaded.columns) == list(frame.columns)
+    assert loaded['Time'].dtype.kind == 'M' and (loaded['Time'] == frame['Time']).all()
+    assert loaded['Count'].dtype == frame['Count'].dtype and (loaded['Count'] == frame['Count']).all()
+    assert np.array_equal(loaded['Depth'], frame['Depth'], equal_nan=True)
+    assert loaded['Flag'].isna().tolist() == [False, True, False, True]
+    assert loaded['Flag'][0] == 'a' and loaded['Flag'][2] == 'c'
+
+
+def parseCount(monkeypatch):
+    '''Number of files parsed by readFile from now on'''
+
+    count = [0]
+    readFile = tide_io.readFile
+
+    def counted(*args):
+        count[0] += 1
+        return readFile(*args)
+
+    monkeypatch.setattr(tide_io, 'readFile', counted)
+
+    return count
+
+
+def testManifestCache(tmp_path, monkeypatch):
+    '''A parsed file is reused from its cache while unchanged'''
+
+    path, expected = loggerFolder(tmp_path)
+    manifest = tide_io.FolderManifest(str(tmp_path))
+    manifest.load(path, '\t', 0, 0)
+    manifest.save()
+
+    count = parseCount(monkeypatch)
+    cached = tide_io.FolderManifest(str(tmp_path)).load(path, '\t', 0, 0)
+
+    assert count[0] == 0
+
+    pd.testing.assert_frame_equal(cached, expected, check_dtype=False)
+
+
+def testPlantedCache(tmp_path, monkeypatch):
+    '''Pickles in the cache directory are never unpickled, the file is parsed again'''
+
+    path, expected = loggerFolder(tmp_path)
+    manifest = tide_io.FolderManifest(str(tmp_path))
+    manifest.load(path, '\t', 0, 0)
+    manifest.save()
+
+    cache = os.path.join(str(tmp_path), tide_io.CACHE_DIR, hashlib.sha1(os.path.abspath(path).encode()).hexdigest())
+    marker = str(tmp_path / 'unpickled')
+
+    with open(cache + '.pkl', 'wb') as f:
+        pickle.dump(Planted(marker), f)
+
+    with open(cache + '.npz', 'wb') as f:
+        np.savez(f, columns=np.array(['Time']), c0=np.array([Planted(marker)], dtype=object))
+
+    count = parseCount(monkeypatch)
+    loaded = tide_io.FolderManifest(str(tmp_path)).load(path, '\t', 0, 0)
+
+    assert count[0] == 1
+    assert not os.path.exists(marker)
+    pd.testing.assert_frame_equal(loaded, expected, check_dtype=False)
+
+
+def testMergeRuns():
+    '''Runs merge in time order and the report names files by their index, empty files included'''
+
+    # File 0 is empty, file 2 is unsorted and file 3 overlaps file 1 with one duplicate timestamp.
+    files = [[], [0, 1, 2, 3], [20, 10, 30], [3, 4, 5]]
+    times = np.array([t for run in files for t in run], dtype='int64')
+    bounds = np.cumsum([0] + [len(run) for run in files])
+    order, starts, report = tide_io.mergeRuns(times, bounds)
+
+    assert times[order].tolist() == [0, 1, 2, 3, 3, 4, 5, 10, 20, 30]
+    assert report == {'runs':3, 'unsorted':[2], 'overlaps':[(1, 3)], 'duplicates':1}
+    assert order[starts[3]] == 3
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import json
+import asyncio
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import tide_harmonic
+import tide_service
+
+
+TIMES = ['2019-03-01T00:00', '2019-03-01T06:30', '2019-03-02T12:00']
+
+
+async def request(port, method, target, body=None, length=None):
+    '''Status and JSON payload of one HTTP request to the service'''
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = b'' if body is None else body if isinstance(body, bytes) else json.dumps(body).encode()
+    length = len(data) if length is None else length
+    head = '{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n'.format(method, target, length)
+    writer.write(head.encode('latin-1') + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+
+    return int(head.split()[1]), json.loads(payload)
+
+
+def serve(client, window=0.2):
+    '''Run client(service, port) against a service started on a free local port'''
+
+    async def main():
+
+        service = tide_service.PredictionService({'Mamuju':benchmark.syntheticModel()}, window)
+        server = await service.start('127.0.0.1', 0)
+
+        try:
+            return await client(service, server.sockets[0].getsockname()[1])
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+def testBatchedPredictions():
+    '''Concurrent requests for one station are synthesized in one batch'''
+
+    async def client(service, port):
+
+        body = {'station':'Mamuju', 'times':TIMES}
+        responses = await asyncio.gather(*[request(port, 'POST', '/predict', body) for _ in range(8)])
+        stats = await request(port, 'GET', '/stats')
+
+        return responses, stats
+
+    responses, (status, stats) = serve(client)
+    expected = tide_harmonic.synthesize(benchmark.syntheticModel(), tide_service.timeNum(TIMES))
+
+    assert status == 200
+    assert stats['Mamuju'] == {'requests':8, 'batches':1}
+
+    for status, payload in responses:
+        assert status == 200
+        assert np.allclose(payload['heights'], expected, atol=1e-9)
+
+
+def testErrors():
+    '''Bad requests, unknown stations and paths, wrong methods and oversized bodies'''
+
+    async def client(service, port):
+
+        return [await request(port, 'POST', '/predict', b'{"station": '),
+                await request(port, 'POST', '/predict', {'station':'Mamuju'}),
+                await request(port, 'POST', '/predict', {'station':'Bitung', 'times':TIMES}),
+                await request(port, 'GET', '/tides'),
+                await request(port, 'GET', '/predict'),
+                await request(port, 'POST', '/predict', length=tide_service.MAX_BODY + 1)]
+
+    statuses = [status for status, payload in serve(client)]
+
+    assert statuses == [400, 400, 404, 404, 405, 413]
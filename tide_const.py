@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+import numpy as np
+from utide import ut_constants, constit_index_dict
+
+
+
+const = ut_constants.const
+
+
+def parseNames(text):
+    '''Constituent names from a comma or space separated text'''
+
+    return [name.strip().upper() for name in text.replace(',', ' ').split() if name.strip() != '']
+
+
+def selectConstituents(duration, interval, rayleigh=1.0, include=(), exclude=()):
+    '''
+    Resolvable constituents for a record of duration hours sampled every interval hours.
+    A constituent is kept if it is below the Nyquist frequency and separated from its
+    comparison constituent by at least rayleigh / duration (Rayleigh criterion), the same
+    decision tree T Tide and U Tide use for their default lists. Names in include skip the
+    Rayleigh test, names in exclude are always dropped.
+    Returns the selected names and a dictionary of dropped names and reasons.
+    '''
+
+    minres = rayleigh / duration
+    nyquist = 0.5 / interval
+    include = set(include)
+    exclude = set(exclude)
+
+    selected = []
+    dropped = {}
+
+    for name in sorted(include - set(const.name)):
+        dropped[name] = 'unknown constituent'
+
+    for i, name in enumerate(const.name):
+        freq = const.freq[i]
+
+        if name == 'Z0':
+            # The mean is fitted by the solvers themselves.
+            continue
+        elif name in exclude:
+            dropped[name] = 'excluded by user'
+        elif freq >= nyquist:
+            dropped[name] = 'above the Nyquist frequency of {:.4f} cph'.format(nyquist)
+        elif name in include:
+            selected.append(name)
+        elif np.isnan(const.ikmpr[i]):
+            dropped[name] = 'not in the standard set'
+        elif const.df[i] < minres:
+            dropped[name] = 'not resolved from {} in {:.1f} days (Rayleigh)'.format(
+                const.kmpr[i], duration / 24)
+        else:
+            selected.append(name)
+
+    return selected, dropped
+
+
+def constituentFreqs(names):
+    '''Frequencies in cycles per hour of the known constituents in names'''
+
+    index = {name: i for i, name in enumerate(const.name)}
+
+    return {name: float(const.freq[index[name]]) for name in names if name in index}
+
+
+def ttideNames(names):
+    '''T Tide compares 4 character constituent names'''
+
+    return [name.ljust(4) for name in names]
+
+
+def dropSummary(dropped):
+    '''Dropped constituents grouped by reason'''
+
+    reasons = {}
+
+    for name, reason in dropped.items():
+        reasons.setdefault(reason, []).append(name)
+
+    return '\n'.join('{}: {}'.format(reason, ', '.join(names)) for reason, names in reasons.items())
@@ -0,0 +1,280 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+
+class Dataset:
+    '''
+    Loaded observation data of one window. Every column is held once as a
+    read-only array together with the file boundaries (time-ordered runs) and
+    the source files, so preprocessing, analysis and export share views of the
+    same memory instead of copying the whole frame. Streamed records larger than
+    RAM keep their columns in memory-mapped files (see fromStreams).
+    '''
+
+    def __init__(self, columns, bounds, files=(), paths=None):
+
+        self._columns = {}
+        columns = dict(columns)
+        # Columns kept on disk, name -> (path, dtype), are memory-mapped instead.
+        self.paths = dict(paths) if paths is not None else {}
+
+        for name, (path, dtype) in self.paths.items():
+            if os.path.getsize(path) > 0:
+                columns[name] = np.memmap(path, dtype=dtype, mode='r')
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+
+        for name, values in columns.items():
+            values = np.asarray(values)
+            values.flags.writeable = False
+            self._columns[name] = values
+
+        self.bounds = np.asarray(bounds)
+        self.bounds.flags.writeable = False
+        self.files = tuple(files)
+
+    @classmethod
+    def fromFrames(cls, frames, files=()):
+        '''Dataset from one parsed frame per file, columns missing from a file are NaN'''
+
+        names = []
+
+        for frame in frames:
+            names += [name for name in frame.columns if name not in names]
+
+        columns = {}
+
+        for name in names:
+            parts = [frame[name].to_numpy() if name in frame.columns else np.full(len(frame), np.nan)
+                     for frame in frames]
+            if len({part.dtype for part in parts}) > 1:
+                parts = [part.astype(object) for part in parts]
+            columns[name] = np.concatenate(parts)
+
+        bounds = np.cumsum([0] + [len(frame) for frame in frames])
+
+        return cls(columns, bounds, files)
+
+    @classmethod
+    def fromStreams(cls, streams, names, folder=None, files=()):
+        '''
+        Dataset of columns written chunk by chunk to files in folder and memory-mapped,
+        one stream of column tuples (in the order of names) per file
+        '''
+
+        if folder is None:
+            folder = tempfile.mkdtemp(prefix='tide_stream_')
+
+        paths = {name: os.path.join(folder, '{}.dat'.format(i)) for i, name in enumerate(names)}
+        outputs = [open(paths[name], 'wb') for name in names]
+        dtypes = [None] * len(names)
+        bounds = [0]
+
+        try:
+            for stream in streams:
+                rows = 0
+                for chunk in stream:
+                    for i, values in enumerate(chunk):
+                        dtypes[i] = values.dtype
+                        outputs[i].write(np.ascontiguousarray(values).tobytes())
+                    rows += len(chunk[0])
+                bounds.append(bounds[-1] + rows)
+        finally:
+            for output in outputs:
+                output.close()
+
+        dtypes = [dtype if dtype is not None else np.dtype('float64') for dtype in dtypes]
+
+        return cls({}, bounds, files, {name: (paths[name], dtypes[i].str) for i, name in enumerate(names)})
+
+    def __len__(self):
+
+        return int(self.bounds[-1])
+
+    @property
+    def nbytes(self):
+        '''Memory held by the columns, text columns estimated from a sample, mapped columns excluded'''
+
+        total = self.bounds.nbytes
+
+        for name, values in self._columns.items():
+            if name in self.paths:
+                continue
+            total += values.nbytes
+            if values.dtype == object and len(values) > 0:
+                sample = values[::max(1, len(values) // 1000)]
+                total += int(np.mean([sys.getsizeof(v) for v in sample]) * len(values))
+
+        return total
+
+    @property
+    def columns(self):
+
+        return list(self._columns)
+
+    def column(self, name):
+        '''Read-only view of one column'''
+
+        return self._columns[name]
+
+    def frame(self, rows=None, columns=None):
+        '''DataFrame over the column arrays, the first rows only if given'''
+
+        if columns is None:
+            columns = self.columns
+
+        return pd.DataFrame({name: self._columns[name][:rows] for name in columns}, copy=False)
+
+
+class RingSeries:
+    '''
+    The last capacity samples of a growing series, times and named values kept in
+    fixed arrays, so appending costs only the new samples
+    '''
+
+    def __init__(self, capacity, names):
+
+        self.capacity = capacity
+        self.time = np.empty(capacity, dtype='datetime64[ns]')
+        self.values = {name: np.full(capacity, np.nan) for name in names}
+        self.size = 0
+        self.head = 0
+
+    def __len__(self):
+
+        return self.size
+
+    def extend(self, time, **values):
+
+        time = np.asarray(time)[-self.capacity:]
+        index = (self.head + np.arange(len(time))) % self.capacity
+        self.time[index] = time
+
+        for name, value in values.items():
+            self.values[name][index] = np.asarray(value)[-self.capacity:]
+
+        self.head = (self.head + len(time)) % self.capacity
+        self.size = min(self.size + len(time), self.capacity)
+
+    def view(self, name=None):
+        '''Times (or the named values) from the oldest sample kept'''
+
+        values = self.time if name is None else self.values[name]
+
+        if self.size < self.capacity:
+            return values[:self.size]
+
+        return np.r_[values[self.head:], values[:self.head]]
+
+
+def resultBytes(results):
+    '''Approximate memory of cached results (arrays and indexes, one level deep)'''
+
+    total = 0
+
+    for value in results.values():
+        if isinstance(value, dict):
+            total += resultBytes(value)
+        elif isinstance(value, (np.ndarray, pd.Index, pd.Series)):
+            total += value.nbytes
+
+    return total
+
+
+class Workspace:
+    '''
+    Several loaded stations, each with its dataset and cached results (prepared series,
+    fitted coefficients), kept in memory under a byte budget. When the budget is exceeded
+    the least recently used stations are spilled to disk and restored on their next use.
+    '''
+
+    def __init__(self, budget=1024 ** 3, spill_dir=None):
+
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self._stations = OrderedDict()
+        self._spilled = {}
+
+    def __contains__(self, name):
+
+        return name in self._stations or name in self._spilled
+
+    def names(self):
+
+        return list(self._stations) + [name for name in self._spilled if name not in self._stations]
+
+    def put(self, name, dataset):
+        '''Add or replace a station, dropping its cached results'''
+
+        self.remove(name)
+        self._stations[name] = {'dataset':dataset, 'results':{}}
+        self._evict()
+
+        return self._stations[name]
+
+    def get(self, name):
+        '''Station entry, marked as most recently used and restored from disk if spilled'''
+
+        if name in self._stations:
+            self._stations.move_to_end(name)
+        else:
+            path = self._spilled.pop(name)
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            os.remove(path)
+            dataset = Dataset(state['columns'], state['bounds'], state['files'], state['paths'])
+            self._stations[name] = {'dataset':dataset, 'results':state['results']}
+            self._evict()
+
+        return self._stations[name]
+
+    def remove(self, name):
+
+        self._stations.pop(name, None)
+        path = self._spilled.pop(name, None)
+
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def nbytes(self):
+        '''Memory held by the stations in memory'''
+
+        return sum(entry['dataset'].nbytes + resultBytes(entry['results']) for entry in self._stations.values())
+
+    def setBudget(self, budget):
+
+        self.budget = budget
+        self._evict()
+
+    def _evict(self):
+        '''Spill least recently used stations until the budget holds, keeping the current one'''
+
+        while len(self._stations) > 1 and self.nbytes() > self.budget:
+            name, entry = self._stations.popitem(last=False)
+            self._spilled[name] = self._spill(name, entry)
+
+    def _spill(self, name, entry):
+
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='tide_workspace_')
+
+        dataset = entry['dataset']
+        # Memory-mapped columns stay in their files, only their location is spilled.
+        state = {'columns':{column: dataset.column(column) for column in dataset.columns
+                            if column not in dataset.paths},
+                 'paths':dataset.paths, 'bounds':dataset.bounds, 'files':dataset.files, 'results':entry['results']}
+        path = os.path.join(self.spill_dir, hashlib.sha1(name.encode()).hexdigest() + '.pkl')
+
+        with open(path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        return path
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+
+import numpy as np
+import pandas as pd
+
+
+
+FILTERS = ('Godin', 'Doodson X0', 'Low-pass')
+LOWPASS_CUTOFF = 40
+LOWPASS_WIDTH = 3
+FILTER_MAX_GAP = 3
+FILTER_BLOCK = 2 ** 18
+DAY_COVERAGE = 0.5
+
+# Doodson X0 weights at lags of 0 to 19 hours (symmetric, sum 30)
+DOODSON = np.array([0, 2, 1, 1, 2, 0, 1, 1, 0, 2, 0, 1, 1, 0, 1, 0, 0, 1, 0, 1]) / 30
+
+
+def kernel(name, interval, cutoff=LOWPASS_CUTOFF):
+    '''
+    Weights of a tidal filter (see FILTERS) for a series sampled every interval hours.
+    Godin is the 24, 24 and 25 hour moving averages applied in turn, Doodson X0 the 39 hour
+    filter on hourly values and Low-pass a Hamming windowed sinc cutting off periods
+    shorter than cutoff hours, LOWPASS_WIDTH cutoffs long on either side.
+    '''
+
+    if name == 'Godin':
+        weights = np.ones(1)
+        for hours in (24, 24, 25):
+            length = max(1, int(round(hours / interval)))
+            weights = np.convolve(weights, np.full(length, 1 / length))
+        return weights
+
+    elif name == 'Doodson X0':
+        per_hour = 1 / interval
+        if interval > 1 or abs(per_hour - round(per_hour)) > 1e-9:
+            raise ValueError('Doodson X0 needs a time interval that divides one hour')
+        per_hour = int(round(per_hour))
+        weights = np.zeros(38 * per_hour + 1)
+        lags = np.arange(-19, 20)
+        weights[(lags + 19) * per_hour] = DOODSON[np.abs(lags)]
+        return weights
+
+    elif name == 'Low-pass':
+        if cutoff <= 2 * interval:
+            raise ValueError('low-pass cutoff must be longer than two time intervals')
+        half = int(np.ceil(LOWPASS_WIDTH * cutoff / interval))
+        hours = np.arange(-half, half + 1) * interval
+        weights = np.sinc(2 * hours / cutoff) * np.hamming(2 * half + 1)
+        return weights / weights.sum()
+
+    raise ValueError('unknown filter ' + str(name))
+
+
+def convolve(signals, weights, block=FILTER_BLOCK):
+    '''
+    Centered convolution of signals (rows) with weights by FFT, overlap-add in blocks
+    so memory stays bounded for long records
+    '''
+
+    signals = np.atleast_2d(signals)
+    n, m = signals.shape[1], len(weights)
+    size = 1 << int(np.ceil(np.log2(block + m - 1)))
+    step = size - m + 1
+    spectrum = np.fft.rfft(weights, size)
+    out = np.zeros((len(signals), n + m - 1))
+
+    for start in range(0, n, step):
+        part = signals[:, start:start + step]
+        length = part.shape[1] + m - 1
+        out[:, start:start + length] += np.fft.irfft(np.fft.rfft(part, size) * spectrum, size)[:, :length]
+
+    return out[:, (m - 1) // 2:(m - 1) // 2 + n]
+
+
+def fillShortGaps(depth, max_gap):
+    '''Series with NaN gaps of up to max_gap samples between valid values linearly interpolated'''
+
+    depth = np.asarray(depth, dtype='float64')
+    valid = ~np.isnan(depth)
+    index = np.arange(len(depth))
+
+    if valid.sum() < 2:
+        return depth.copy()
+
+    # Last valid sample before and first valid sample after every position
+    before = np.maximum.accumulate(np.where(valid, index, -1))
+    after = np.minimum.accumulate(np.where(valid, index, len(depth))[::-1])[::-1]
+    short = ~valid & (before >= 0) & (after < len(depth)) & (after - before - 1 <= max_gap)
+
+    filled = depth.copy()
+    filled[short] = np.interp(index[short], index[valid], depth[valid])
+
+    return filled
+
+
+def applyFilter(depth, weights, max_gap=0):
+    '''
+    Filtered series of an evenly spaced series with NaN gaps. Gaps of up to max_gap samples
+    are interpolated first, values whose window (non-zero weights) reaches a longer gap or
+    beyond the record are NaN, as tidal filters only cancel the tide over whole windows.
+    '''
+
+    depth = fillShortGaps(depth, max_gap)
+    valid = ~np.isnan(depth)
+
+    filtered, held = convolve(np.vstack([np.where(valid, depth, 0.0), valid]), weights)
+
+    if np.any(weights < 0):
+        held = convolve(valid, np.abs(weights))[0] / np.abs(weights).sum()
+
+    filtered[held < 1 - 1e-6] = np.nan
+
+    return filtered
+
+
+def dailyMean(time, filtered, coverage=DAY_COVERAGE):
+    '''Daily mean of a filtered series, NaN for days with less than coverage of valid values'''
+
+    series = pd.Series(filtered, index=pd.DatetimeIndex(time))
+    days = series.resample('D')
+    daily = days.mean()
+    held = days.count() / days.size()
+    daily[held < coverage] = np.nan
+
+    return daily
+
+
+def trend(daily):
+    '''Linear trend of a daily series by least squares, returns the rate per year and the trend line'''
+
+    years = (daily.index - daily.index[0]) / pd.Timedelta(days=365.25)
+    years = np.asarray(years, dtype='float64')
+    valid = ~np.isnan(daily.values)
+
+    if valid.sum() < 2:
+        return np.nan, pd.Series(np.nan, index=daily.index)
+
+    rate, offset = np.polyfit(years[valid], daily.values[valid], 1)
+
+    return rate, pd.Series(offset + rate * years, index=daily.index)
+
+
+def meanSeaLevel(time, depth, interval, name, cutoff=LOWPASS_CUTOFF):
+    '''
+    Filtered series and daily table (MSL, Trend and MSL_detrended, the MSL about the trend)
+    of an evenly spaced series, with the trend rate per year
+    '''
+
+    filtered = applyFilter(depth, kernel(name, interval, cutoff), int(FILTER_MAX_GAP / interval))
+    daily = dailyMean(time, filtered)
+    rate, line = trend(daily)
+
+    table = pd.DataFrame({'MSL':daily, 'Trend':line, 'MSL_detrended':daily - line})
+    table.index.name = 'Date'
+
+    return filtered, table, rate
@@ -0,0 +1,738 @@
+#!/usr/bin/python3
+
+import re
+import json
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
+from matplotlib.dates import date2num
+from utide import constit_index_dict
+from utide.harmonics import FUV, linearized_freqs
+import tide_solve
+
+
+
+SYNTH_CHUNK = 65536
+NODAL_STEP = 1.0
+NODAL_MIN_STEP = 1 / 24
+NODAL_TOLERANCE = 1e-4
+TILE_STEPS = 4096
+MAX_TILES = 512
+
+REGULAR_BLOCK = 1 / 24
+
+TABLE_STEP = 1 / 48
+TABLE_TOLERANCE = 1 / 86400
+
+BOOT_REALIZATIONS = 200
+BOOT_BATCH = 25
+BOOT_BLOCK = 1.0
+BOOT_LEVEL = 95
+
+DATUM_YEARS = 18.61
+DATUM_STEP = 1 / 1440
+DATUM_CHUNK = 2 ** 20
+TIDAL_DAY = 1.0350
+SPRING_NEAP = 14.7653
+
+SPECTRUM_SEGMENT = 30.0
+SPECTRUM_COVERAGE = 0.5
+SPECTRUM_BATCH = 64
+
+
+def harmonicModel(coef, method, lat, reftime=None):
+    '''
+    Constituents, amplitudes and Greenwich phases of a T Tide or U Tide fit for synthesis.
+    T Tide fits carry no reference time, reftime (e.g. the record center) is used instead.
+    Reference times are date2num day numbers like the prediction times.
+    '''
+
+    table = tide_solve.constituentTable(coef, method)
+    lind = np.array([constit_index_dict[name] for name in table.index])
+
+    if method == 'T Tide':
+        mean = float(coef['z0'])
+        slope = 0.0
+    else:
+        mean = float(coef.mean)
+        slope = float(coef.get('slope', 0.0))
+        reftime = float(coef.aux.reftime) - tide_solve.ordinalOffset()
+
+    return {'name':list(table.index), 'lind':lind, 'A':table['A'].values, 'g':table['g'].values,
+            'mean':mean, 'slope':slope, 'reftime':reftime, 'lat':lat}
+
+
+def nodalFactors(model, time_num):
+    '''
+    Nodal amplitude factors and phase residuals (cycles) of every constituent, computed in
+    full at each time. The residual is the nodal phase and astronomical argument minus the
+    linear advance at the linearized frequencies, so it varies slowly.
+    '''
+
+    tref = model['reftime']
+    lind = model['lind']
+    F, U, V = FUV(tide_solve.ordinalDays(time_num), tide_solve.ordinalDays(tref), lind, model['lat'],
+                  [False, False, False, False])
+    freq = _freqs(model)
+
+    return F, U + V - 24 * (time_num[:, None] - tref) * freq[None, :]
+
+
+def _freqs(model):
+    '''Linearized frequencies (cycles per hour) of the model's constituents at its reference time'''
+
+    return linearized_freqs(tide_solve.ordinalDays(model['reftime']))[model['lind']]
+
+
+def nodalTable(model, start, end, step=NODAL_STEP, tolerance=NODAL_TOLERANCE):
+    '''
+    Nodal factors and phase residuals tabulated every step days between start and end.
+    The water level error of linear interpolation is estimated at the midpoints of the
+    table and the step halved (down to NODAL_MIN_STEP) until it is within tolerance.
+    '''
+
+    A = model['A']
+
+    while True:
+        n = max(2, int(np.ceil((end - start) / step)) + 1)
+        grid = start + 0.5 * step * np.arange(2 * n - 1)
+        F, P = nodalFactors(model, grid)
+        # Residuals wrap at whole cycles, the table is interpolated on the unwrapped ones.
+        P = np.unwrap(2 * np.pi * P, axis=0) / (2 * np.pi)
+
+        dF = np.abs(0.5 * (F[:-2:2] + F[2::2]) - F[1::2])
+        dP = np.abs(0.5 * (P[:-2:2] + P[2::2]) - P[1::2])
+        error = np.max(dF @ A + 2 * np.pi * (dP * F[1::2]) @ A)
+
+        if error <= tolerance or step <= NODAL_MIN_STEP:
+            return {'start':start, 'step':step, 'F':F[::2], 'P':P[::2], 'error':error}
+
+        step = max(0.5 * step, NODAL_MIN_STEP)
+
+
+def nodalInterp(table, time_num):
+    '''Nodal factors and phase residuals interpolated from a nodal table'''
+
+    x = (time_num - table['start']) / table['step']
+    i = np.clip(np.floor(x).astype('int64'), 0, len(table['F']) - 2)
+    w = (x - i)[:, None]
+
+    F = table['F'][i] * (1 - w) + table['F'][i + 1] * w
+    P = table['P'][i] * (1 - w) + table['P'][i + 1] * w
+
+    return F, P
+
+
+def synthesize(model, time_num, step=NODAL_STEP, tolerance=NODAL_TOLERANCE):
+    '''
+    Water level of a harmonic model at the given times (days, as passed to the solvers).
+    Nodal corrections and astronomical arguments vary slowly, they are tabulated every
+    step days and interpolated (see nodalTable for the tolerance), so the cost is one
+    cosine per constituent and time, evaluated in chunks. With step None they are computed
+    in full at every time, as reconstruct does.
+    '''
+
+    time_num = np.asarray(time_num, dtype='float64')
+
+    if len(time_num) == 0:
+        return np.empty(0)
+
+    model = _referenced(model, time_num)
+    table = None if step is None else nodalTable(model, np.min(time_num), np.max(time_num), step, tolerance)
+
+    return _evaluate(model, time_num, table)
+
+
+def synthesizeRegular(model, start, step, n, block=REGULAR_BLOCK):
+    '''
+    Water level of a harmonic model at n regular times from start every step days. The
+    times are split into blocks of block days. Each constituent advances through a block by
+    the same rotations exp(i omega k step), tabulated once, so every block is a row of one
+    complex matrix product instead of a cosine per constituent and time. The nodal factors
+    (see nodalTable) are linear within a block, their slopes are a second product.
+    '''
+
+    if n == 0:
+        return np.empty(0)
+
+    model = _referenced(model, np.array([start, start + step * (n - 1)]))
+    tref = model['reftime']
+    freq = _freqs(model)
+    length = max(1, int(round(block / step)))
+    count = -(-n // length)
+
+    offsets = step * (np.arange(length) - 0.5 * (length - 1))
+    edges = start - 0.5 * step + step * length * np.arange(count + 1)
+    table = nodalTable(model, start, start + step * (n - 1))
+    F, P = nodalInterp(table, edges)
+    centers = 0.5 * (edges[:-1] + edges[1:])
+    dF, dP = np.diff(F, axis=0) / (step * length), np.diff(P, axis=0) / (step * length)
+    F, P = 0.5 * (F[:-1] + F[1:]), 0.5 * (P[:-1] + P[1:])
+
+    phase = 2 * np.pi * (24 * (centers - tref)[:, None] * freq[None, :] + P) - np.deg2rad(model['g'])[None, :]
+    phasor = model['A'] * np.exp(1j * phase)
+    rotation = np.exp(2j * np.pi * 24 * freq[:, None] * offsets[None, :])
+    # F exp(2 pi i P) to first order in the offset from the block center
+    level = ((phasor * F) @ rotation + (phasor * (dF + 2j * np.pi * dP * F)) @ (rotation * offsets[None, :]))
+    level = level.real.ravel()[:n]
+    hours = 24 * (start + step * np.arange(n) - tref)
+
+    return level + model['mean'] + model['slope'] * hours / 24
+
+
+def _referenced(model, time_num):
+    '''Model with the center of the times as reference time if it has none'''
+
+    if model['reftime'] is None:
+        model = dict(model, reftime=0.5 * (np.min(time_num) + np.max(time_num)))
+
+    return model
+
+
+def _evaluate(model, time_num, table=None, derivative=False):
+    '''Water level (or its rate of change per day) in chunks, nodal factors from table if given'''
+
+    tref = model['reftime']
+    freq = _freqs(model)
+    g = np.deg2rad(model['g'])
+    level = np.empty(len(time_num))
+
+    for start in range(0, len(time_num), SYNTH_CHUNK):
+        chunk = time_num[start:start + SYNTH_CHUNK]
+
+        if table is None:
+            F, P = nodalFactors(model, chunk)
+        else:
+            F, P = nodalInterp(table, chunk)
+
+        hours = 24 * (chunk - tref)
+        arg = 2 * np.pi * (hours[:, None] * freq[None, :] + P) - g[None, :]
+
+        if derivative:
+            # Nodal factors vary too slowly to contribute to the rate of change.
+            omega = 2 * np.pi * 24 * freq
+            level[start:start + SYNTH_CHUNK] = -(F * np.sin(arg)) @ (model['A'] * omega) + model['slope']
+        else:
+            level[start:start + SYNTH_CHUNK] = (F * np.cos(arg)) @ model['A'] + model['mean'] + model['slope'] * hours / 24
+
+    return level
+
+
+def tideTable(model, start, end, step=TABLE_STEP, tolerance=TABLE_TOLERANCE):
+    '''
+    High and low waters of a harmonic model between start and end (days). The analytic
+    rate of change is evaluated every step days, its sign changes bracket the turning
+    points, which are refined by bisection to within tolerance days. Turning points
+    closer than step together (double high waters) may be missed.
+    Returns the times, heights and whether each is a high water.
+    '''
+
+    time_num = np.arange(start, end + step, step)
+    model = _referenced(model, time_num)
+    table = nodalTable(model, time_num[0], time_num[-1])
+
+    rate = _evaluate(model, time_num, table, derivative=True)
+    i = np.flatnonzero(np.sign(rate[:-1]) * np.sign(rate[1:]) < 0)
+    rising = rate[i] > 0
+    lo, hi = time_num[i], time_num[i + 1]
+
+    for _ in range(max(1, int(np.ceil(np.log2(step / tolerance))))):
+        mid = 0.5 * (lo + hi)
+        same = (_evaluate(model, mid, table, derivative=True) > 0) == rising
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+
+    times = 0.5 * (lo + hi)
+    keep = (times >= start) & (times <= end)
+
+    return times[keep], _evaluate(model, times[keep], table), rising[keep]
+
+
+def predictRecords(model, records):
+    '''
+    Water level at arbitrary timestamps (e.g. survey pings) of (lines, times) chunks,
+    yielded as (lines, level), NaN where a time could not be read
+    '''
+
+    for lines, times in records:
+        if times is None:
+            yield lines, None
+            continue
+
+        level = np.full(len(times), np.nan)
+        valid = ~np.isnat(times)
+
+        if valid.any():
+            level[valid] = synthesize(model, date2num(times[valid]))
+
+        yield lines, level
+
+
+def saveModel(model, path):
+    '''Write a harmonic model as JSON, or as compact binary arrays if path ends with .npz'''
+
+    if path.lower().endswith('.npz'):
+        reftime = np.nan if model['reftime'] is None else model['reftime']
+        np.savez(path, name=np.asarray(model['name'], dtype='U'), lind=model['lind'], A=model['A'], g=model['g'],
+                 scalars=np.array([model['mean'], model['slope'], reftime, model['lat']], dtype='float64'))
+        return
+
+    state = {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in model.items()}
+
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=1)
+
+
+def loadModel(path):
+    '''Read a harmonic model written by saveModel'''
+
+    if path.lower().endswith('.npz'):
+        with np.load(path) as arrays:
+            mean, slope, reftime, lat = arrays['scalars'].tolist()
+            return {'name':arrays['name'].tolist(), 'lind':arrays['lind'].astype('int64'),
+                    'A':arrays['A'].astype('float64'), 'g':arrays['g'].astype('float64'), 'mean':mean,
+                    'slope':slope, 'reftime':None if np.isnan(reftime) else reftime, 'lat':lat}
+
+    with open(path, 'r') as f:
+        model = json.load(f)
+
+    model['lind'] = np.asarray(model['lind'], dtype='int64')
+    model['A'] = np.asarray(model['A'], dtype='float64')
+    model['g'] = np.asarray(model['g'], dtype='float64')
+
+    return model
+
+
+def reportModel(names, A, g, lat, mean=0.0):
+    '''
+    Harmonic model of constituent names, amplitudes and Greenwich phases read from a report.
+    A Z0 constituent is taken as the mean. Reports carry no reference time, the center of
+    the predicted times is used (see _referenced).
+    '''
+
+    names = [str(name).strip().lstrip('*').upper() for name in names]
+    A = np.asarray(A, dtype='float64')
+    g = np.asarray(g, dtype='float64')
+
+    if 'Z0' in names:
+        i = names.index('Z0')
+        mean = float(A[i])
+        names, A, g = names[:i] + names[i + 1:], np.delete(A, i), np.delete(g, i)
+
+    unknown = [name for name in names if name not in constit_index_dict]
+
+    if len(unknown) > 0:
+        raise ValueError('unknown constituents: ' + ', '.join(unknown))
+
+    return {'name':names, 'lind':np.array([constit_index_dict[name] for name in names], dtype='int64'),
+            'A':A, 'g':g, 'mean':mean, 'slope':0.0, 'reftime':None, 'lat':lat}
+
+
+def _reportColumns(line):
+    '''Numeric columns named in a report table header, None if it has no amplitude and phase'''
+
+    kinds = {'freq':'freq', 'frq':'freq', 'per':'period', 'amp':'amp', 'pha':'pha', 'snr':'snr'}
+    columns = []
+
+    # Error columns are named "amp_err" or "Amp Err", the second word turns the first into the error column.
+    for word in re.findall('[a-z_]+', line.lower()):
+        base, _, suffix = word.partition('_')
+        kind = [k for p, k in kinds.items() if base.startswith(p)]
+
+        if base in ('err', 'ci') and len(columns) > 0:
+            columns[-1] = columns[-1] + '_err'
+        elif len(kind) > 0:
+            columns.append(kind[0] + ('_err' if suffix in ('err', 'ci') else ''))
+
+    return columns if 'amp' in columns and 'pha' in columns else None
+
+
+def _ttideReport(lines, lat):
+    '''
+    Model from a T Tide report (t_utils.pandas_style). The table is the first header with
+    amplitude and phase columns followed by rows of a name and one number per column.
+    '''
+
+    for i, line in enumerate(lines):
+        columns = _reportColumns(line)
+        if columns is None:
+            continue
+
+        names, A, g = [], [], []
+
+        for row in lines[i + 1:]:
+            fields = row.split()
+            try:
+                values = [float(field) for field in fields[1:]]
+            except ValueError:
+                continue
+            if len(values) != len(columns):
+                continue
+            names.append(fields[0])
+            A.append(values[columns.index('amp')])
+            g.append(values[columns.index('pha')])
+
+        if len(names) > 0:
+            mean = re.search(r'\b[xz]0\s*=\s*([-+\d.eE]+)', '\n'.join(lines[:i]))
+            return reportModel(names, A, g, lat, float(mean.group(1)) if mean is not None else 0.0)
+
+    raise ValueError('no amplitude and phase table found')
+
+
+def readCoefficients(path, lat):
+    '''
+    Harmonic model from saved coefficients: a model (.json or .npz, see saveModel),
+    a U Tide report (tab separated name, frq, lind, A, g, ...) or a T Tide report.
+    lat is used for reports, which do not carry it.
+    '''
+
+    if path.lower().endswith(('.json', '.npz')):
+        return loadModel(path)
+
+    with open(path, 'r') as f:
+        lines = f.read().splitlines()
+
+    header = lines[0].split('\t') if len(lines) > 0 else []
+
+    if 'A' in header and 'g' in header:
+        table = pd.read_csv(path, sep='\t', index_col=0)
+        return reportModel(table.index, table['A'], table['g'], lat)
+
+    return _ttideReport(lines, lat)
+
+
+def modelKey(model):
+    '''Digest of a harmonic model, equal for equal fits'''
+
+    state = {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in model.items()}
+
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+
+class _BinMean:
+    '''Running mean of the largest value per time bin, for time-ordered values arriving in chunks'''
+
+    def __init__(self, width):
+
+        self.width = width
+        self.bin = None
+        self.value = -np.inf
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, time_num, values):
+
+        if len(values) == 0:
+            return
+
+        bins = np.floor(time_num / self.width).astype('int64')
+        starts = np.r_[0, np.flatnonzero(np.diff(bins)) + 1]
+        keys = bins[starts]
+        maxima = np.maximum.reduceat(values, starts)
+
+        if keys[0] == self.bin:
+            maxima[0] = max(maxima[0], self.value)
+        elif self.bin is not None:
+            self.total += self.value
+            self.count += 1
+
+        self.total += np.sum(maxima[:-1])
+        self.count += len(maxima) - 1
+        self.bin, self.value = keys[-1], maxima[-1]
+
+    def mean(self):
+
+        if self.bin is None:
+            return np.nan
+
+        return (self.total + self.value) / (self.count + 1)
+
+
+def datums(model, start, years=DATUM_YEARS, step=DATUM_STEP, chunk=DATUM_CHUNK):
+    '''
+    Tidal datums of a harmonic model predicted every step days over years from start
+    (a full nodal cycle by default). The prediction is streamed in chunks (see
+    synthesizeRegular), only extremes and running sums are kept:
+    HAT/LAT highest and lowest astronomical tide, MSL mean sea level,
+    MHW/MLW mean high and low water, MHHW/MLLW mean higher high and lower low water
+    of each tidal day, MHWS/MLWS mean highest high and lowest low water of each
+    spring-neap cycle.
+    '''
+
+    n = int(round(years * 365.25 / step)) + 1
+    highest, lowest, total = -np.inf, np.inf, 0.0
+    high_sum, high_count, low_sum, low_count = 0.0, 0, 0.0, 0
+    daily_high, daily_low = _BinMean(TIDAL_DAY), _BinMean(TIDAL_DAY)
+    spring_high, spring_low = _BinMean(SPRING_NEAP), _BinMean(SPRING_NEAP)
+    carry = np.empty(0)
+
+    for first in range(0, n, chunk):
+        level = synthesizeRegular(model, start + step * first, step, min(chunk, n - first))
+
+        highest = max(highest, np.max(level))
+        lowest = min(lowest, np.min(level))
+        total += np.sum(level)
+
+        # The last two samples of the previous chunk complete the turning points at its end.
+        h = np.r_[carry, level]
+        t = step * (first - len(carry) + np.arange(len(h)))
+        carry = h[-2:]
+        rise = h[1:-1] > h[:-2]
+        highs = np.flatnonzero(rise & (h[1:-1] >= h[2:])) + 1
+        lows = np.flatnonzero(~rise & (h[1:-1] < h[2:])) + 1
+
+        high_sum += np.sum(h[highs])
+        high_count += len(highs)
+        low_sum += np.sum(h[lows])
+        low_count += len(lows)
+
+        daily_high.add(t[highs], h[highs])
+        daily_low.add(t[lows], -h[lows])
+        spring_high.add(t[highs], h[highs])
+        spring_low.add(t[lows], -h[lows])
+
+    return {'HAT':highest, 'MHWS':spring_high.mean(), 'MHHW':daily_high.mean(), 'MHW':high_sum / high_count,
+            'MSL':total / n, 'MLW':low_sum / low_count, 'MLLW':-daily_low.mean(), 'MLWS':-spring_low.mean(),
+            'LAT':lowest}
+
+
+def bootstrapBatch(model, time_num, fitted, residual, block, count, seed):
+    '''
+    Amplitudes and phases refitted to count realizations of the fitted tide plus the residual
+    resampled in circular blocks of block samples, run in a worker process. The normal
+    equations of the model's constituents are accumulated in chunks for all realizations
+    at once. seed is a numpy SeedSequence.
+    '''
+
+    rng = np.random.default_rng(seed)
+    n = len(time_num)
+    starts = rng.integers(0, n, size=(count, -(-n // block)))
+
+    tref = model['reftime']
+    freq = _freqs(model)
+    table = nodalTable(model, np.min(time_num), np.max(time_num))
+    k = len(freq)
+    XtX = np.zeros((2 * k + 1, 2 * k + 1))
+    XtY = np.zeros((2 * k + 1, count))
+
+    for start in range(0, n, SYNTH_CHUNK):
+        chunk = time_num[start:start + SYNTH_CHUNK]
+        pos = start + np.arange(len(chunk))
+
+        F, P = nodalInterp(table, chunk)
+        arg = 2 * np.pi * (24 * (chunk - tref)[:, None] * freq[None, :] + P)
+        X = np.hstack([np.ones((len(chunk), 1)), F * np.cos(arg), F * np.sin(arg)])
+        Y = fitted[pos][:, None] + residual[(starts[:, pos // block] + pos % block) % n].T
+
+        XtX += X.T @ X
+        XtY += X.T @ Y
+
+    solution = np.linalg.solve(XtX, XtY)
+    a, b = solution[1:k + 1], solution[k + 1:]
+
+    return np.hypot(a, b).T, np.rad2deg(np.arctan2(b, a)).T % 360
+
+
+def confidenceIntervals(model, time_num, observed, realizations=BOOT_REALIZATIONS, seed=0, workers=None,
+                        level=BOOT_LEVEL):
+    '''
+    Amplitude and phase confidence intervals (half widths at level percent) from a block
+    bootstrap of the residual, realizations spread over a process pool in batches of
+    BOOT_BATCH. Every batch has its own child of SeedSequence(seed), so the intervals
+    do not depend on the number of workers.
+    '''
+
+    time_num = np.asarray(time_num, dtype='float64')
+    observed = np.asarray(observed, dtype='float64')
+    valid = ~np.isnan(observed)
+    time_num, observed = time_num[valid], observed[valid]
+
+    model = _referenced(model, time_num)
+    fitted = synthesize(model, time_num)
+    residual = observed - fitted
+    # Blocks of BOOT_BLOCK days keep the correlation of the residual (surges, seiches).
+    block = max(1, int(round(BOOT_BLOCK / np.median(np.diff(time_num)))))
+
+    counts = [BOOT_BATCH] * (realizations // BOOT_BATCH)
+    if realizations % BOOT_BATCH > 0:
+        counts.append(realizations % BOOT_BATCH)
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        batches = list(pool.map(bootstrapBatch, repeat(model), repeat(time_num), repeat(fitted), repeat(residual),
+                                repeat(block), counts, seeds))
+
+    A = np.vstack([batch[0] for batch in batches])
+    g = np.vstack([batch[1] for batch in batches])
+    dg = (g - model['g'] + 180) % 360 - 180
+    q = [(100 - level) / 2, (100 + level) / 2]
+
+    table = pd.DataFrame({'A':model['A'], 'A_ci':0.5 * np.diff(np.percentile(A, q, axis=0), axis=0)[0],
+                          'g':model['g'], 'g_ci':0.5 * np.diff(np.percentile(dg, q, axis=0), axis=0)[0]},
+                         index=pd.Index(model['name'], name='name'))
+
+    return table
+
+
+def hindcast(coef, method, lat, time_num, observed):
+    '''
+    Fitted water level and residual at the observation times. U Tide keeps no fitted series
+    and T Tide's xout is on the gap-filled grid, so the fitted model with its mean (z0 or the
+    U Tide mean) is synthesized from the tabulated nodal corrections (see synthesize), not by
+    another t_predic or reconstruct with the full astronomy at every time.
+    '''
+
+    observed = np.asarray(observed, dtype='float64')
+    fitted = synthesize(harmonicModel(coef, method, lat), time_num)
+
+    return {'prediction':fitted, 'residual':observed - fitted}
+
+
+def residualStats(time, observed, residual, events=5):
+    '''RMS, variance explained and the largest surges and setdowns of a residual series'''
+
+    observed = np.asarray(observed, dtype='float64')
+    residual = np.asarray(residual, dtype='float64')
+    valid = ~np.isnan(observed) & ~np.isnan(residual)
+
+    stats = {'RMS residual':np.sqrt(np.mean(residual[valid] ** 2)),
+             'variance explained (%)':100 * (1 - np.var(residual[valid]) / np.var(observed[valid])),
+             'surges':largestEvents(time[valid], residual[valid], events),
+             'setdowns':largestEvents(time[valid], -residual[valid], events, sign=-1)}
+
+    return stats
+
+
+def largestEvents(time, residual, events=5, separation=pd.Timedelta(days=1), sign=1):
+    '''Largest residual peaks at least separation apart, as (time, residual) pairs'''
+
+    picked = []
+
+    for i in np.argsort(-residual):
+        if len(picked) == events:
+            break
+        if all(abs(time[i] - time[j]) >= separation for j in picked):
+            picked.append(i)
+
+    return [(time[i], sign * residual[i]) for i in picked]
+
+
+def spectrum(depth, interval, segment=SPECTRUM_SEGMENT, coverage=SPECTRUM_COVERAGE, batch=SPECTRUM_BATCH):
+    '''
+    Welch power spectral density of an evenly spaced series with NaN gaps, interval in hours,
+    frequencies in cycles per hour. Half overlapping Hann windowed segments of segment days
+    (the whole record if shorter) are averaged. Segments with less than coverage of valid
+    samples are skipped, the gaps of the others are zero after removing the segment mean and
+    the density is normalized by the window energy over the valid samples only.
+    Returns the frequencies, the density and the number of segments used.
+    '''
+
+    depth = np.asarray(depth, dtype='float64')
+    length = int(min(len(depth), round(segment * 24 / interval)))
+    freq = np.fft.rfftfreq(length, interval)
+    density = np.zeros(len(freq))
+    used = 0
+
+    if length < 2:
+        return freq, density, used
+
+    window = np.hanning(length)
+    starts = np.arange(0, len(depth) - length + 1, max(1, length // 2))
+    # One-sided density, the zero and Nyquist frequencies are not doubled.
+    scale = np.full(len(freq), 2 * interval)
+    scale[0] = interval
+    if length % 2 == 0:
+        scale[-1] = interval
+
+    for first in range(0, len(starts), batch):
+        frames = np.lib.stride_tricks.sliding_window_view(depth, length)[starts[first:first + batch]]
+        valid = ~np.isnan(frames)
+        keep = valid.mean(axis=1) >= coverage
+
+        if not keep.any():
+            continue
+
+        frames, valid = frames[keep], valid[keep]
+        mean = np.nansum(frames, axis=1) / valid.sum(axis=1)
+        frames = np.where(valid, frames - mean[:, None], 0.0) * window
+        energy = (valid * window ** 2).sum(axis=1)
+
+        density += (np.abs(np.fft.rfft(frames, axis=1)) ** 2 / energy[:, None]).sum(axis=0) * scale
+        used += len(frames)
+
+    if used > 0:
+        density /= used
+
+    return freq, density, used
+
+
+class TileCache:
+    '''
+    Predictions cached in fixed tiles of TILE_STEPS samples per (model, interval).
+    Tiles sit on a grid anchored at the unix epoch, so overlapping date ranges at the
+    same interval share tiles and only missing tiles are synthesized. Least recently
+    used tiles are evicted beyond max_tiles.
+    '''
+
+    def __init__(self, tile_steps=TILE_STEPS, max_tiles=MAX_TILES):
+
+        self.tile_steps = tile_steps
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def predict(self, model, model_key, time_index):
+        '''Water level at the regular times of time_index (a pd.DatetimeIndex)'''
+
+        if len(time_index) < 2:
+            return synthesize(model, date2num(time_index.values))
+
+        ns = time_index.values.astype('datetime64[ns]').astype('int64')
+        step = int(ns[1] - ns[0])
+        offset = int(ns[0] % step)
+        first = (int(ns[0]) - offset) // step
+        last = first + len(ns) - 1
+
+        level = np.empty(len(ns))
+
+        for tile in range(first // self.tile_steps, last // self.tile_steps + 1):
+            values = self.tile(model, (model_key, step, offset, tile))
+            tile_first = tile * self.tile_steps
+            lo = max(first, tile_first)
+            hi = min(last, tile_first + self.tile_steps - 1)
+            level[lo - first:hi - first + 1] = values[lo - tile_first:hi - tile_first + 1]
+
+        return level
+
+    def tile(self, model, key):
+
+        if key in self.tiles:
+            self.hits += 1
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        self.misses += 1
+        _, step, offset, tile = key
+        ns = offset + (tile * self.tile_steps + np.arange(self.tile_steps, dtype='int64')) * step
+        values = synthesize(model, date2num(ns.astype('datetime64[ns]')))
+        self.tiles[key] = values
+
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+
+        return values
+
+    def clear(self):
+
+        self.tiles.clear()
+
+    def stats(self):
+
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total > 0 else 0.0
+
+        return {'tiles':len(self.tiles), 'hits':self.hits, 'misses':self.misses, 'hit rate (%)':rate}
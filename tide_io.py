@@ -0,0 +1,954 @@
+#!/usr/bin/python3
+
+import os
+import io
+import re
+import gzip
+import json
+import lzma
+import hashlib
+import zipfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+
+SEPARATORS = {'Tab': '\t', 'Comma': ',', 'Semicolon': ';', 'Space': ' '}
+
+TEXT_TYPES = {'.txt': ['.txt'], '.csv': ['.csv'], '.dat': ['.dat'], 'All': ['.txt', '.csv', '.dat']}
+
+OUTPUT_FORMATS = {'Text': None, 'Parquet': '.parquet', 'NetCDF': '.nc', 'NumPy': '.npy'}
+
+MANIFEST_NAME = '.tide_manifest.json'
+CACHE_DIR = '.tide_cache'
+
+DUPLICATE_POLICIES = {'Keep First': 'first', 'Keep Last': 'last', 'Average': 'mean'}
+
+SNIFF_LINES = 64
+SNIFF_BYTES = 65536
+PRESCAN_WORKERS = 16
+READ_WORKERS = 4
+
+# Compressed files are read directly, members of a zip archive are addressed as
+# 'archive.zip::member.txt'.
+COMPRESSED = {'.gz': gzip.open, '.xz': lzma.open}
+ARCHIVES = ('.zip',)
+MEMBER_SEP = '::'
+
+# Parsed size of one text row (line, field strings and frame overhead) used to
+# turn a RAM budget into a chunk length when streaming.
+STREAM_ROW_BYTES = 512
+
+# Most bytes parsed by one read of a growing file, keeping every update equally cheap.
+TAIL_BYTES = 4 * 1024 ** 2
+
+# Known logger layouts. 'header' is the 0-based (non-blank) line of the column
+# names and 'data_start' the number of rows skipped between the header and the
+# first record, i.e. one less than the dialog's "Data Starting Line".
+PROFILES = {
+    'Valeport': {'signature': re.compile(r'valeport', re.I), 'sep': '\t', 'header': 21, 'data_start': 1},
+    'Valeport (Comma)': {'signature': re.compile(r'valeport', re.I), 'sep': ',', 'header': 21, 'data_start': 1},
+}
+
+# Column names of water level records, preferred over other numeric columns (e.g. temperature).
+DEPTH_NAMES = re.compile(r'depth|level|height|tide|elev', re.I)
+
+_DATE_PATTERN = re.compile(r'^\s*\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?\s*$'
+                           r'|^\s*\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?\s*$')
+_UNIT_PATTERN = re.compile(r'^\s*[\[(]?\s*(m|cm|mm|ft|dbar|db|bar|mbar|s|sec|%|deg\w*|[dmyhs/:. -]+)\s*[\])]?\s*$', re.I)
+
+
+def archivePath(path):
+    '''File on disk holding a path, the archive for a zip member'''
+
+    return path.partition(MEMBER_SEP)[0]
+
+
+@contextlib.contextmanager
+def openText(path):
+    '''Text stream of a plain or compressed file or of a zip member, decompressed while read'''
+
+    archive, _, member = path.partition(MEMBER_SEP)
+    suffix = os.path.splitext(archive)[1].lower()
+
+    if member != '':
+        with zipfile.ZipFile(archive) as z, z.open(member) as raw:
+            yield io.TextIOWrapper(raw, errors='replace')
+    elif suffix in COMPRESSED:
+        with COMPRESSED[suffix](path, 'rt', errors='replace') as f:
+            yield f
+    else:
+        with open(path, 'r', errors='replace') as f:
+            yield f
+
+
+def matchesType(name, extensions):
+    '''Whether a file name has one of the extensions, also below a compression suffix'''
+
+    name = name.lower()
+    stem, suffix = os.path.splitext(name)
+
+    if suffix in COMPRESSED:
+        name = stem
+
+    return name.endswith(tuple(extensions))
+
+
+def expandArchives(paths, extensions):
+    '''Paths with every zip archive replaced by its members matching the extensions'''
+
+    expanded = []
+
+    for path in paths:
+        if path.lower().endswith(ARCHIVES):
+            with zipfile.ZipFile(path) as z:
+                expanded += [path + MEMBER_SEP + name for name in z.namelist()
+                             if not name.endswith('/') and matchesType(name, extensions)]
+        else:
+            expanded.append(path)
+
+    return expanded
+
+
+def readPrefix(path, n_lines=SNIFF_LINES, n_bytes=SNIFF_BYTES):
+    '''Read the first non-blank lines of a file without touching the rest of it'''
+
+    lines = []
+
+    with openText(path) as f:
+        prefix = f.read(n_bytes)
+
+    for line in prefix.splitlines()[:-1] if len(prefix) == n_bytes else prefix.splitlines():
+        if line.strip() == '':
+            continue
+        lines.append(line)
+        if len(lines) == n_lines:
+            break
+
+    return lines
+
+
+def fieldType(value):
+    '''Classify a single text field as numeric, datetime or text'''
+
+    value = value.strip()
+
+    try:
+        float(value)
+        return 'numeric'
+    except ValueError:
+        pass
+
+    if _DATE_PATTERN.match(value):
+        return 'datetime'
+    else:
+        return 'text'
+
+
+def _isRecord(fields):
+    '''A record has at least one numeric or datetime field'''
+
+    return any(fieldType(v) != 'text' for v in fields)
+
+
+def _isUnits(fields):
+    '''A units row only holds unit or date format labels'''
+
+    return all(_UNIT_PATTERN.match(v) or v.strip() == '' for v in fields)
+
+
+def _split(line, sep):
+
+    return line.rstrip('\r\n').split(sep)
+
+
+def sniffLines(lines):
+    '''
+    Detect separator, header line, data start and column types from the first
+    lines of a logger file. Returns None if no tabular layout is found.
+    '''
+
+    for profile_name, profile in PROFILES.items():
+        if any(profile['signature'].search(line) for line in lines[:profile['header']]):
+            result = _describe(lines, profile['sep'], profile['header'], profile['data_start'])
+            if result is not None:
+                result['profile'] = profile_name
+                return result
+
+    for sep in SEPARATORS.values():
+        counts = [len(_split(line, sep)) for line in lines]
+
+        # The data block is the trailing run of lines sharing one field count.
+        width = counts[-1] if counts else 0
+        if width < 2:
+            continue
+
+        first = len(counts) - 1
+        while first > 0 and counts[first - 1] == width:
+            first -= 1
+
+        block = lines[first:]
+        records = [_isRecord(_split(line, sep)) for line in block]
+
+        if True not in records or all(records):
+            # No header row above the data inside the block.
+            continue
+
+        # Header is the last label row above the records, unless that row
+        # is a units row directly below the column names.
+        header = len(records) - 1 - records[::-1].index(False)
+        data_start = 0
+        if header > 0 and not records[header - 1] and _isUnits(_split(block[header], sep)):
+            header -= 1
+            data_start = 1
+
+        if not all(records[header + data_start + 1:]):
+            continue
+
+        result = _describe(lines, sep, first + header, data_start)
+
+        if result is not None:
+            result['profile'] = None
+            return result
+
+    return None
+
+
+def _describe(lines, sep, header, data_start):
+    '''Column names and types for a given layout, or None if the layout does not fit'''
+
+    if header + data_start + 1 >= len(lines):
+        return None
+
+    columns = [c.strip() for c in _split(lines[header], sep)]
+    rows = [_split(line, sep) for line in lines[header + data_start + 1:]]
+
+    if len(columns) < 2 or any(len(row) != len(columns) for row in rows) or not _isRecord(rows[0]):
+        return None
+
+    dtypes = {}
+
+    for j, column in enumerate(columns):
+        types = {fieldType(row[j]) for row in rows if row[j].strip() != ''}
+        dtypes[column] = types.pop() if len(types) == 1 else 'text'
+
+    return {'sep': sep, 'header': header, 'data_start': data_start, 'columns': columns, 'dtypes': dtypes}
+
+
+def sniffFile(path):
+    '''Detect the layout of a logger file from its first lines only'''
+
+    return sniffLines(readPrefix(path))
+
+
+def seriesHeaders(layout, columns=None):
+    '''
+    Likely time and depth columns of a sniffed layout (among columns if given), None where
+    not found. The depth is the first numeric column named like a water level (DEPTH_NAMES),
+    otherwise the first numeric one.
+    '''
+
+    dtypes = layout['dtypes'] if layout is not None else {}
+
+    if columns is None:
+        columns = list(dtypes)
+
+    times = [c for c in columns if dtypes.get(c) == 'datetime']
+    depths = [c for c in columns if dtypes.get(c) == 'numeric']
+    depths = [c for c in depths if DEPTH_NAMES.search(c)] + [c for c in depths if not DEPTH_NAMES.search(c)]
+
+    return (times[0] if len(times) > 0 else None, depths[0] if len(depths) > 0 else None)
+
+
+def checkFile(path, sep, header, data_start):
+    '''
+    Validate user parse options against the first lines of a file.
+    Returns an error message, or None if the options fit.
+    '''
+
+    return _checkLines(path, readPrefix(path), sep, header, data_start)
+
+
+def _checkLines(path, lines, sep, header, data_start):
+
+    if header + data_start + 1 >= len(lines):
+        return '{}: header/data line is beyond the first {} lines.'.format(path, len(lines))
+
+    layout = _describe(lines, sep, header, data_start)
+
+    if layout is None:
+        detected = sniffLines(lines)
+        if detected is None:
+            return '{}: no column layout found with the selected options.'.format(path)
+
+        sep_name = [k for k, v in SEPARATORS.items() if v == detected['sep']][0]
+        return ('{}: does not match the selected options, detected separator "{}", '
+                'header line {} and data line {}.').format(path, sep_name, detected['header'] + 1,
+                                                           detected['data_start'] + 1)
+
+    if all(fieldType(column) != 'text' for column in layout['columns']):
+        return '{}: line {} looks like data, not a header.'.format(path, header + 1)
+
+    return None
+
+
+def prescanFile(path, sep=None, header=0, data_start=0):
+    '''
+    Layout of a file from its first lines, detected if sep is None, otherwise checked
+    against the given options. Returns the layout and an error message, one of them None.
+    '''
+
+    lines = readPrefix(path)
+
+    if sep is None:
+        layout = sniffLines(lines)
+        return (layout, None) if layout is not None else (None, path + ': no column layout found.')
+
+    problem = _checkLines(path, lines, sep, header, data_start)
+
+    if problem is not None:
+        return None, problem
+
+    return _describe(lines, sep, header, data_start), None
+
+
+def prescan(paths, sep=None, header=0, data_start=0, workers=PRESCAN_WORKERS):
+    '''First lines of every file read in parallel threads, returns the layouts and error messages'''
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda path: prescanFile(path, sep, header, data_start), paths))
+
+    return [layout for layout, _ in results], [problem for _, problem in results if problem is not None]
+
+
+def groupSchemas(paths, layouts):
+    '''Files grouped by their set of column names, as (columns, paths), the largest group first'''
+
+    groups = {}
+
+    for path, layout in zip(paths, layouts):
+        groups.setdefault(frozenset(layout['columns']), (layout['columns'], []))[1].append(path)
+
+    return sorted(groups.values(), key=lambda group: -len(group[1]))
+
+
+def schemaProblems(groups):
+    '''Error messages for the files whose columns differ from the largest group'''
+
+    problems = []
+
+    if len(groups) < 2:
+        return problems
+
+    columns, members = groups[0]
+
+    for other, paths in groups[1:]:
+        missing = [c for c in columns if c not in other]
+        extra = [c for c in other if c not in columns]
+        reason = 'columns differ from the other {} file(s)'.format(len(members))
+        if len(missing) > 0:
+            reason += ', missing ' + ', '.join(missing)
+        if len(extra) > 0:
+            reason += ', extra ' + ', '.join(extra)
+        problems += ['{}: {}.'.format(path, reason) for path in paths]
+
+    return problems
+
+
+def readFile(path, sep, header, data_start):
+    '''Full read of a single logger file with known parse options'''
+
+    with openText(path) as f:
+        raw_single = pd.read_csv(f, sep=sep, header=header)
+
+    raw_single = raw_single.iloc[data_start:, 0:]
+
+    # Unit rows below the header turn numeric columns into text, restore them.
+    if data_start > 0:
+        raw_single = raw_single.reset_index(drop=True)
+        for column in raw_single.columns:
+            numeric = pd.to_numeric(raw_single[column], errors='coerce')
+            if numeric.notna().all():
+                raw_single[column] = numeric
+
+    return raw_single
+
+
+def streamFile(path, sep, header, data_start, time, depth, dayfirst=False, budget=64 * 1024 ** 2):
+    '''
+    Time (datetime64[ns]) and depth (float64) of a logger file read in chunks,
+    each holding about budget bytes of parsed text
+    '''
+
+    rows = max(1024, budget // STREAM_ROW_BYTES)
+    skip = data_start
+
+    with openText(path) as f:
+        for chunk in pd.read_csv(f, sep=sep, header=header, usecols=[time, depth], chunksize=rows):
+            if skip > 0:
+                chunk, skip = chunk.iloc[skip:], max(0, skip - len(chunk))
+            if len(chunk) == 0:
+                continue
+
+            times = pd.to_datetime(chunk[time], dayfirst=dayfirst).to_numpy(dtype='datetime64[ns]')
+            depths = pd.to_numeric(chunk[depth], errors='coerce').to_numpy(dtype='float64')
+
+            yield times, depths
+
+
+def streamRecords(path, sep, header, data_start, time, dayfirst=False, budget=64 * 1024 ** 2):
+    '''
+    Raw record lines of a file with their times (datetime64[ns]) read in chunks of about
+    budget bytes of text. The first item holds the lines above the records and no times.
+    '''
+
+    with openText(path) as f:
+        head = []
+        columns = None
+
+        while len(head) < header + data_start + 1:
+            line = f.readline()
+            if line == '':
+                break
+            line = line.rstrip('\r\n')
+            if line.strip() == '':
+                continue
+            if len(head) == header:
+                columns = [c.strip() for c in _split(line, sep)]
+            head.append(line)
+
+        yield head, None
+
+        rest = ''
+
+        while True:
+            text = f.read(budget)
+            text, rest = rest + text, ''
+            if text == '':
+                break
+
+            # A partial last line is kept for the next chunk, unless the file ends there.
+            end = text.rfind('\n') + 1
+            if end > 0 and end < len(text):
+                text, rest = text[:end], text[end:]
+
+            lines = text.splitlines()
+            if '' in lines:
+                lines = [line for line in lines if line.strip() != '']
+                text = '\n'.join(lines)
+            if len(lines) == 0:
+                continue
+
+            # Only the time column is parsed, the lines themselves are passed on untouched.
+            frame = pd.read_csv(io.StringIO(text), sep=sep, header=None, names=columns, usecols=[time],
+                                skip_blank_lines=False)
+            if len(frame) != len(lines):
+                raise ValueError('{}: records could not be matched to their lines.'.format(path))
+
+            times = pd.to_datetime(frame[time], dayfirst=dayfirst, errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+            yield lines, times
+
+
+def writeRecords(records, path, sep, header, column='Tide', decimals=4):
+    '''
+    Record lines written with one more field holding their values, from (lines, values)
+    chunks whose first item holds the lines above the records. Returns the number of records.
+    '''
+
+    form = '%.' + str(decimals) + 'f\n'
+    rows = 0
+
+    with open(path, 'w') as f:
+        for lines, values in records:
+            if values is None:
+                for i, line in enumerate(lines):
+                    # Column name on the header line, empty field on unit lines below it.
+                    f.write(line + (sep + column if i == header else sep if i > header else '') + '\n')
+                continue
+
+            # One formatting call per chunk, missing values left empty.
+            text = ((form * len(values)) % tuple(values.tolist())).replace('nan', '').splitlines()
+            f.write('\n'.join(map(sep.join, zip(lines, text))) + '\n')
+            rows += len(lines)
+
+    return rows
+
+
+def siblingPath(path, suffix):
+    '''
+    Path next to a file (or next to the archive of a zip member) named after it with
+    suffix before its extension, without compression suffix
+    '''
+
+    archive, _, member = path.partition(MEMBER_SEP)
+    root, ext = os.path.splitext(os.path.basename(member) if member != '' else archive)
+
+    if ext.lower() in COMPRESSED:
+        root, ext = os.path.splitext(root)
+
+    return os.path.join(os.path.dirname(archive), os.path.basename(root) + suffix + ext)
+
+
+def aggregateChunks(chunks, step):
+    '''
+    Chunks of (time, depth) averaged into bins of step, labelled by the bin start.
+    The last bin of a chunk may continue in the next one, it is carried over.
+    '''
+
+    step = np.int64(pd.Timedelta(step).value)
+    pending = (np.empty(0, dtype='int64'), np.empty(0), np.empty(0))
+
+    for times, depths in chunks:
+        valid = ~np.isnan(depths)
+        bins = np.r_[pending[0], times.astype('int64') // step]
+        sums = np.r_[pending[1], np.where(valid, depths, 0.0)]
+        counts = np.r_[pending[2], valid.astype('float64')]
+
+        keys, inverse = np.unique(bins, return_inverse=True)
+        sums = np.bincount(inverse, sums, len(keys))
+        counts = np.bincount(inverse, counts, len(keys))
+
+        last = keys == bins[-1]
+        pending = (keys[last], sums[last], counts[last])
+
+        if not last.all():
+            yield _binned(keys[~last], sums[~last], counts[~last], step)
+
+    if len(pending[0]) > 0:
+        yield _binned(*pending, step)
+
+
+def _binned(keys, sums, counts, step):
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (keys * step).astype('datetime64[ns]'), sums / counts
+
+
+def readFiles(paths, layouts, read=readFile, workers=READ_WORKERS):
+    '''
+    Parsed files in order, read on a few threads so that decompressing and parsing
+    of different files overlap
+    '''
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda item: read(item[0], item[1]['sep'], item[1]['header'], item[1]['data_start']),
+                             zip(paths, layouts)))
+
+
+class FileTail:
+    '''
+    Reader of a logger file that is being appended to. Every read parses only the complete
+    lines written since the previous one (at most TAIL_BYTES), from the saved byte offset.
+    A file that shrinks (rotated or rewritten) is read again from its start.
+    '''
+
+    def __init__(self, path, sep, header, data_start, time, depth, dayfirst=False):
+
+        self.path = path
+        self.sep = sep
+        self.header = header
+        self.data_start = data_start
+        self.time = time
+        self.depth = depth
+        self.dayfirst = dayfirst
+        self.columns = None
+        self.offset = None
+
+    def _start(self):
+        '''Column names and the offset of the first record, False if not written yet'''
+
+        with open(self.path, 'rb') as f:
+            count = 0
+            while count < self.header + self.data_start + 1:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    return False
+                line = line.decode(errors='replace')
+                if line.strip() == '':
+                    continue
+                if count == self.header:
+                    self.columns = [c.strip() for c in _split(line, self.sep)]
+                count += 1
+            self.offset = f.tell()
+
+        return True
+
+    def read(self):
+        '''Time (datetime64[ns]) and depth (float64) of the records appended since the last read'''
+
+        empty = (np.empty(0, dtype='datetime64[ns]'), np.empty(0))
+
+        if os.path.getsize(self.path) < (self.offset or 0):
+            self.offset = None
+
+        if self.offset is None and not self._start():
+            return empty
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(TAIL_BYTES)
+
+        # A partly written last line is left for the next read.
+        end = data.rfind(b'\n') + 1
+
+        if end == 0:
+            return empty
+
+        self.offset += end
+        frame = pd.read_csv(io.BytesIO(data[:end]), sep=self.sep, header=None, names=self.columns,
+                            usecols=[self.time, self.depth])
+
+        times = pd.to_datetime(frame[self.time], dayfirst=self.dayfirst).to_numpy(dtype='datetime64[ns]')
+        depths = pd.to_numeric(frame[self.depth], errors='coerce').to_numpy(dtype='float64')
+
+        return times, depths
+
+
+def mergeRuns(times, bounds):
+    '''
+    Merge time-ordered runs (one per file) into one ordered index without a global sort.
+    times is the int64 time of every record, bounds the run offsets (len(runs) + 1).
+    Returns the merge order, the start of every distinct timestamp in it and a report
+    (unsorted files and overlapping pairs by their position in bounds).
+    '''
+
+    times = np.asarray(times)
+    # Empty files are left out, runs keep their file index for the report.
+    runs = {i: np.arange(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i + 1] > bounds[i]}
+    report = {'runs':len(runs), 'unsorted':[], 'overlaps':[], 'duplicates':0}
+
+    for i, run in runs.items():
+        if np.any(np.diff(times[run]) < 0):
+            report['unsorted'].append(i)
+            runs[i] = run[np.argsort(times[run], kind='stable')]
+
+    # Group runs whose time spans overlap. Clusters of one run are already in
+    # place, larger clusters are merged by timsort, which gallops through the
+    # pre-sorted runs instead of sorting from scratch.
+    by_start = sorted(runs, key=lambda i: times[runs[i][0]])
+    clusters = []
+    cluster_end = None
+
+    for i in by_start:
+        first, last = times[runs[i][0]], times[runs[i][-1]]
+        if cluster_end is not None and first <= cluster_end:
+            report['overlaps'].append((clusters[-1][-1], i))
+            clusters[-1].append(i)
+            cluster_end = max(cluster_end, last)
+        else:
+            clusters.append([i])
+            cluster_end = last
+
+    pieces = []
+
+    for cluster in clusters:
+        if len(cluster) == 1:
+            pieces.append(runs[cluster[0]])
+        else:
+            # Keep load order inside a cluster so ties resolve by file order.
+            merged = np.concatenate([runs[i] for i in sorted(cluster)])
+            pieces.append(merged[np.argsort(times[merged], kind='stable')])
+
+    order = np.concatenate(pieces) if len(pieces) > 0 else np.array([], dtype='int64')
+    ordered = times[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]]) if len(order) > 0 else order
+    report['duplicates'] = len(order) - len(starts)
+
+    return order, starts, report
+
+
+def resolveDuplicates(data, order, starts, column, policy='first'):
+    '''Rows of data in merge order, one per timestamp, duplicates resolved by policy'''
+
+    ends = np.r_[starts[1:], len(order)]
+
+    if policy == 'last':
+        rows = order[ends - 1]
+    else:
+        rows = order[starts]
+
+    if len(rows) == len(data) and np.all(rows[1:] > rows[:-1]):
+        # Already in order without duplicates, the rows are used as they are instead of copied.
+        merged = data
+    else:
+        merged = data.iloc[rows]
+
+    if policy == 'mean' and len(starts) < len(order):
+        values = np.asarray(data[column], dtype='float64')[order]
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        counts = np.add.reduceat(valid.astype('int64'), starts)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            merged = merged.copy()
+            merged[column] = sums / counts
+
+    return merged
+
+
+def mergeSummary(report, policy_name):
+    '''One line description of a merge report'''
+
+    text = '{} file(s)'.format(report['runs'])
+
+    if len(report['overlaps']) > 0:
+        text += ', {} overlap(s)'.format(len(report['overlaps']))
+    if len(report['unsorted']) > 0:
+        text += ', {} unsorted file(s)'.format(len(report['unsorted']))
+    if report['duplicates'] > 0:
+        text += ', {} duplicate timestamp(s) resolved by {}'.format(report['duplicates'], policy_name)
+
+    return text
+
+
+def findGaps(time, step):
+    '''
+    Gaps of a time-ordered series sampled every step, as the position of the record
+    before each gap, its first missing time and the number of missing samples
+    '''
+
+    time = np.asarray(time, dtype='datetime64[ns]')
+    step = np.timedelta64(step, 'ns')
+    # Gaps not a multiple of step keep their last partial interval, as date_range did.
+    length = -((time[:-1] - time[1:]) // step) - 1
+    after = np.flatnonzero(length > 0)
+
+    return pd.DataFrame({'after':after, 'start':time[after] + step, 'length':length[after]})
+
+
+def fillGaps(time, depth, gaps, step):
+    '''Regular series with NaN at the missing samples of the gaps'''
+
+    time = np.asarray(time, dtype='datetime64[ns]')
+    counts = np.ones(len(time), dtype='int64')
+    counts[gaps['after'].values] += gaps['length'].values
+    first = np.cumsum(counts) - counts
+    offset = np.arange(counts.sum()) - np.repeat(first, counts)
+
+    grid_time = np.repeat(time, counts) + offset * np.timedelta64(step, 'ns')
+    grid_depth = np.full(len(grid_time), np.nan)
+    grid_depth[first] = depth
+
+    return pd.DatetimeIndex(grid_time), grid_depth
+
+
+def gapSummary(gaps, step):
+    '''One line description of the gaps of a series'''
+
+    if len(gaps) == 0:
+        return 'no gaps'
+
+    missing = int(gaps['length'].sum())
+
+    return '{} gap(s), {} missing sample(s) ({})'.format(len(gaps), missing, pd.Timedelta(step) * missing)
+
+
+class FolderManifest:
+    '''
+    Per-folder record of the scanned directory tree and of every parsed file
+    (size, mtime, parse options and the location of its parsed result), so that
+    reopening a folder only lists changed directories and parses changed files.
+    '''
+
+    def __init__(self, folder):
+
+        self.folder = os.path.abspath(folder)
+        self.path = os.path.join(self.folder, MANIFEST_NAME)
+        self.dirs = {}
+        self.files = {}
+
+        try:
+            with open(self.path, 'r') as f:
+                manifest = json.load(f)
+            self.dirs = manifest['dirs']
+            self.files = manifest['files']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def scan(self, extensions):
+        '''
+        Files below the folder matching any extension, also compressed, and the matching
+        members of zip archives, listing only directories that changed
+        '''
+
+        extensions = tuple(ext.lower() for ext in extensions)
+        found = []
+        pending = [self.folder]
+
+        while len(pending) > 0:
+            directory = pending.pop()
+
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                self.dirs.pop(directory, None)
+                continue
+
+            listing = self.dirs.get(directory)
+
+            if listing is None or listing['mtime'] != mtime:
+                listing = {'mtime':mtime, 'files':[], 'subdirs':[]}
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name in (MANIFEST_NAME, CACHE_DIR):
+                            continue
+                        elif entry.is_dir():
+                            listing['subdirs'].append(entry.name)
+                        else:
+                            listing['files'].append(entry.name)
+                self.dirs[directory] = listing
+
+            found += [os.path.join(directory, name) for name in listing['files']
+                      if matchesType(name, extensions) or name.lower().endswith(ARCHIVES)]
+            pending += [os.path.join(directory, name) for name in listing['subdirs']]
+
+        return expandArchives(sorted(found), extensions)
+
+    def load(self, path, sep, header, data_start):
+        '''
+        Parsed file, reused from the cache when size, mtime and parse options are unchanged.
+        The cache location follows from the path, not from the (shared, writable) manifest,
+        and holds plain arrays only (see saveFrame), so a planted cache cannot run code.
+        '''
+
+        path = os.path.abspath(path)
+        stat = os.stat(archivePath(path))
+        options = [sep, header, data_start]
+        entry = self.files.get(path)
+        cache = os.path.join(self.folder, CACHE_DIR, hashlib.sha1(path.encode()).hexdigest() + '.npz')
+
+        if (entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns
+                and entry['options'] == options and os.path.exists(cache)):
+            try:
+                return loadFrame(cache)
+            except Exception:
+                pass
+
+        raw_single = readFile(path, sep, header, data_start)
+
+        try:
+            os.makedirs(os.path.dirname(cache), exist_ok=True)
+            saveFrame(raw_single, cache)
+        except OSError:
+            # Read-only folder, parse every time.
+            return raw_single
+
+        self.files[path] = {'size':stat.st_size, 'mtime':stat.st_mtime_ns, 'options':options}
+
+        return raw_single
+
+    def save(self):
+        '''Write the manifest next to the data, dropping entries of deleted files'''
+
+        self.files = {path: entry for path, entry in self.files.items() if os.path.exists(archivePath(path))}
+
+        try:
+            with open(self.path, 'w') as f:
+                json.dump({'dirs':self.dirs, 'files':self.files}, f)
+        except OSError:
+            pass
+
+
+def saveFrame(frame, path):
+    '''
+    Parsed frame as arrays in an .npz file without pickled objects. Text columns are
+    stored as unicode with a mask of their missing values.
+    '''
+
+    arrays = {'columns':np.array([str(name) for name in frame.columns])}
+
+    for i, name in enumerate(frame.columns):
+        values = frame[name].to_numpy()
+        if values.dtype.kind == 'O':
+            missing = pd.isna(values)
+            arrays['na{}'.format(i)] = missing
+            values = np.where(missing, '', values).astype(str)
+        arrays['c{}'.format(i)] = values
+
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def loadFrame(path):
+    '''Frame written by saveFrame'''
+
+    with np.load(path, allow_pickle=False) as arrays:
+        data = {}
+        for i, name in enumerate(arrays['columns'].tolist()):
+            values = arrays['c{}'.format(i)]
+            if 'na{}'.format(i) in arrays.files:
+                values = values.astype(object)
+                values[arrays['na{}'.format(i)]] = np.nan
+            data[name] = values
+
+    return pd.DataFrame(data)
+
+
+def outputPath(path, fmt):
+    '''Save location with the extension of the output format'''
+
+    ext = OUTPUT_FORMATS[fmt]
+
+    if ext is None:
+        return path
+    else:
+        return os.path.splitext(path)[0] + ext
+
+
+def writeTable(frame, path, fmt='Text', sep='\t'):
+    '''
+    Write predictions or merged data as delimited text or in a binary format.
+    Parquet needs pyarrow and NetCDF needs xarray with netCDF4, both raise
+    ImportError if missing. NumPy writes a structured array with a JSON sidecar
+    describing the columns. Returns the written path.
+    '''
+
+    path = outputPath(path, fmt)
+
+    if fmt == 'Text':
+        frame.to_csv(path, sep=sep, index=False)
+
+    elif fmt == 'Parquet':
+        frame.to_parquet(path, index=False, compression='zstd')
+
+    elif fmt == 'NetCDF':
+        import xarray as xr
+        dataset = xr.Dataset.from_dataframe(frame.reset_index(drop=True))
+        encoding = {name: {'zlib': True, 'complevel': 4} for name in dataset.data_vars
+                    if dataset[name].dtype.kind in 'fiu'}
+        dataset.to_netcdf(path, encoding=encoding)
+
+    elif fmt == 'NumPy':
+        columns = []
+
+        for name in frame.columns:
+            values = frame[name].to_numpy()
+            if values.dtype.kind == 'M':
+                values = values.astype('datetime64[ns]')
+            elif values.dtype.kind not in 'biuf':
+                values = values.astype(str)
+            columns.append((str(name), values))
+
+        table = np.empty(len(frame), dtype=[(name, values.dtype) for name, values in columns])
+        for name, values in columns:
+            table[name] = values
+
+        np.save(path, table, allow_pickle=False)
+
+        header = {'rows': len(frame), 'columns': [name for name, _ in columns],
+                  'dtypes': [values.dtype.str for _, values in columns]}
+        with open(path + '.json', 'w') as f:
+            json.dump(header, f, indent=1)
+
+    return path
+
+
+def readNumpyTable(path):
+    '''Read a table written by writeTable in NumPy format'''
+
+    table = np.load(path, allow_pickle=False)
+
+    return pd.DataFrame({name: table[name] for name in table.dtype.names})
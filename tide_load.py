@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+
+from pathlib import Path
+from PyQt5.QtWidgets import (QFileDialog, QDialog, QGridLayout, QMessageBox, QComboBox, QLabel, QPushButton,
+                             QSpinBox, QCheckBox, QTextBrowser)
+from PyQt5.QtGui import QIcon
+import tide_io
+import tide_data
+
+
+
+class DataLoader:
+    '''
+    Load Data dialog and ingestion shared by the main widget and the data merger. Files
+    are checked from their first lines, read once into a Dataset and handed on in memory.
+    Windows add their own dialog options (loadOptions, filled from the selected files by
+    filesSelected) and reading (readDataset).
+    '''
+
+    def initLoader(self):
+
+        self.filesList = []
+        self.folderManifest = None
+        self.dataset = None
+        self.showState = QLabel()
+
+
+    def loadDataDialog(self):
+        '''Load Data Widget UI'''
+
+        loadData = QDialog()
+        loadData.setWindowTitle('Load Data')
+        loadData.setWindowIcon(QIcon('load-pngrepo-com.png'))
+
+        openFilesButton = QPushButton('Open File(s)')
+        openFilesButton.clicked.connect(self.filesDialog)
+        openFolderButton = QPushButton('Open Folder')
+        openFolderButton.clicked.connect(self.folderDialog)
+
+        sepLabel = QLabel('Separator:')
+        self.sepCB = QComboBox()
+        self.sepCB.addItems(['Tab', 'Comma', 'Space', 'Semicolon'])
+
+        textTypeLabel = QLabel('Text Type')
+        self.textTypeCB = QComboBox()
+        self.textTypeCB.addItems(list(tide_io.TEXT_TYPES))
+
+        headerLineLabel = QLabel('Header Starting Line:')
+        self.headerLineSB = QSpinBox()
+        self.headerLineSB.setMinimum(1)
+
+        dataLineLabel = QLabel('Data Starting Line:')
+        self.dataLineSB = QSpinBox()
+        self.dataLineSB.setMinimum(1)
+
+        self.autoCheckBox = QCheckBox('Auto Detect Format')
+        self.autoCheckBox.setChecked(False)
+        detectButton = QPushButton('Detect Format')
+        detectButton.clicked.connect(self.detectFormat)
+
+        locLabel = QLabel('Location:')
+        self.locList = QTextBrowser()
+
+        self.showCheckBox = QCheckBox('Show All Data to Table')
+        self.showCheckBox.setChecked(False)
+        self.showCheckBox.toggled.connect(self.showCheckBoxState)
+        self.showState.clear()
+
+        cancelButton = QPushButton('Cancel')
+        cancelButton.clicked.connect(loadData.close)
+        loadButton = QPushButton('Load')
+        loadButton.clicked.connect(self.loadAction)
+        loadButton.clicked.connect(loadData.close)
+
+        grid = QGridLayout()
+        grid.addWidget(openFilesButton, 1, 1, 1, 2)
+        grid.addWidget(openFolderButton, 1, 3, 1, 2)
+
+        grid.addWidget(sepLabel, 2, 1, 1, 1)
+        grid.addWidget(self.sepCB, 2, 2, 1, 1)
+        grid.addWidget(textTypeLabel, 2, 3, 1, 1)
+        grid.addWidget(self.textTypeCB, 2, 4, 1, 1)
+
+        grid.addWidget(headerLineLabel, 3, 1, 1, 1)
+        grid.addWidget(self.headerLineSB, 3, 2, 1, 1)
+        grid.addWidget(dataLineLabel, 3, 3, 1, 1)
+        grid.addWidget(self.dataLineSB, 3, 4, 1, 1)
+
+        grid.addWidget(locLabel, 4, 1, 1, 1)
+        grid.addWidget(self.autoCheckBox, 4, 3, 1, 1)
+        grid.addWidget(detectButton, 4, 4, 1, 1)
+
+        grid.addWidget(self.locList, 5, 1, 10, 4)
+
+        row = self.loadOptions(grid, 15)
+
+        grid.addWidget(self.showCheckBox, row, 1, 1, 2)
+        grid.addWidget(loadButton, row, 3, 1, 1)
+        grid.addWidget(cancelButton, row, 4, 1, 1)
+
+        loadData.setLayout(grid)
+
+        loadData.exec_()
+
+
+    def loadOptions(self, grid, row):
+        '''Extra dialog options of a window from row on, returns the next free row'''
+
+        return row
+
+
+    def filesSelected(self):
+        '''Fill the window's dialog options from newly selected files'''
+
+        pass
+
+
+    def showCheckBoxState(self):
+
+        if self.showCheckBox.isChecked() == True:
+            self.showState.setText(self.showCheckBox.text())
+        else:
+            self.showState.setText('unchecked')
+
+
+    def filesDialog(self):
+        '''Load from files Dialog'''
+
+        home_dir = str(Path.home())
+        fileFilter = ('All Files (*.*) ;; Text Files (*.txt) ;; Comma Separated Value (*.csv) ;; DAT Files (*.dat) ;; '
+                      'Compressed Files (*.gz *.xz *.zip)')
+        selectedFilter = 'Text Files (*.txt)'
+        fname = QFileDialog.getOpenFileNames(self, 'Open File(s)', home_dir, fileFilter, selectedFilter)
+
+        # Zip archives are replaced by their data files.
+        self.filesList = tide_io.expandArchives(fname[0], tide_io.TEXT_TYPES['All'])
+        self.folderManifest = None
+
+        fileListPrint = ''
+
+        for file in self.filesList:
+            fileListPrint += file + '\n'
+
+        self.locList.setText(fileListPrint)
+        self.filesSelected()
+
+
+    def folderDialog(self):
+        '''Load from folder Dialog'''
+
+        home_dir = str(Path.home())
+        fname = QFileDialog.getExistingDirectory(self, 'Open Folder', home_dir)
+
+        if fname == '':
+            return
+
+        textTypeSelect = tide_io.TEXT_TYPES[self.textTypeCB.currentText()]
+
+        # The manifest only lists directories and parses files that changed since the last visit.
+        self.folderManifest = tide_io.FolderManifest(fname)
+        self.filesList = self.folderManifest.scan(textTypeSelect)
+        self.folderManifest.save()
+
+        fileListPrint = ''
+
+        for file in self.filesList:
+            fileListPrint += file + '\n'
+
+        self.locList.setText(fileListPrint)
+        self.filesSelected()
+
+
+    def detectFormat(self):
+        '''Fill separator, header and data line from the first selected file'''
+
+        if len(self.filesList) == 0:
+            return
+
+        layout = tide_io.sniffFile(self.filesList[0])
+
+        if layout is None:
+            self.loadWarning([self.filesList[0] + ': no column layout found.'])
+            return
+
+        sep_name = [k for k, v in tide_io.SEPARATORS.items() if v == layout['sep']][0]
+        self.sepCB.setCurrentText(sep_name)
+        self.headerLineSB.setValue(layout['header'] + 1)
+        self.dataLineSB.setValue(layout['data_start'] + 1)
+
+
+    def loadDataDict(self):
+        '''Raw data merger'''
+
+        head = self.headerLineSB.value() - 1
+        start_data = self.dataLineSB.value() - 1
+        sepSelect = tide_io.SEPARATORS[self.sepCB.currentText()]
+
+        # Check every file from its first lines (in parallel) before any full read,
+        # files with other columns than the rest are reported too.
+        sep = None if self.autoCheckBox.isChecked() else sepSelect
+        layouts, problems = tide_io.prescan(self.filesList, sep, head, start_data)
+
+        if len(problems) == 0:
+            problems = tide_io.schemaProblems(tide_io.groupSchemas(self.filesList, layouts))
+
+        if len(problems) > 0:
+            self.loadWarning(problems)
+            return None
+
+        self.dataset = self.readDataset(layouts)
+
+        return self.dataset
+
+
+    def readDataset(self, layouts):
+        '''Every selected file parsed in full, a folder through its manifest'''
+
+        read = self.folderManifest.load if self.folderManifest is not None else tide_io.readFile
+        dummy = tide_io.readFiles(self.filesList, layouts, read)
+
+        if self.folderManifest is not None:
+            self.folderManifest.save()
+
+        # Every file is kept as a time-ordered run for the merge in inputDict1.
+        return tide_data.Dataset.fromFrames(dummy, self.filesList)
+
+
+    def loadWarning(self, problems):
+
+        loadWarning = QMessageBox()
+        loadWarning.setWindowTitle('Warning')
+        loadWarning.setIcon(QMessageBox.Critical)
+        loadWarning.setText('Cannot load data, check the separator, header and data starting line '
+                            'and that all files have the same columns.')
+        loadWarning.setDetailedText('\n'.join(problems))
+
+        loadWarning.exec_()
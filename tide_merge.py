@@ -3,21 +3,27 @@
 import sys
 from pathlib import Path
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import (QApplication, QWidget, QTableWidget, QLineEdit, QFileDialog, QDialog,
-                             QGridLayout, QMessageBox, QVBoxLayout, QComboBox, QLabel, QPushButton,
-                             QTableWidgetItem, QSpinBox, QScrollArea, QCheckBox, QTextBrowser)
+from PyQt5.QtWidgets import (QApplication, QWidget, QTableWidget, QLineEdit, QFileDialog, QGridLayout,
+                             QMessageBox, QVBoxLayout, QComboBox, QLabel, QPushButton, QTableWidgetItem,
+                             QScrollArea, QCheckBox, QTextBrowser)
 from PyQt5.QtGui import QIcon
-import pandas as pd
-import glob
-import os
+import tide_io
+import tide_load
 
 
 
-class MergeData(QWidget):
+class MergeData(tide_load.DataLoader, QWidget):
+    '''
+    Files merged into one dataset, handed to receiver(dataset, files) (the main widget)
+    in memory and written to a file only if exported
+    '''
 
-    def __init__(self):
+    def __init__(self, receiver=None):
         super(MergeData, self).__init__()
 
+        self.initLoader()
+        self.receiver = receiver
+
         self.initUI()
 
 
@@ -34,6 +40,13 @@ class MergeData(QWidget):
         self.sepOutCB = QComboBox()
         self.sepOutCB.addItems(['Tab', 'Comma', 'Semicolon'])
 
+        formatLabel = QLabel('Output Format:')
+        self.formatCB = QComboBox()
+        self.formatCB.addItems(list(tide_io.OUTPUT_FORMATS))
+
+        self.exportCheckBox = QCheckBox('Export Merged File')
+        self.exportCheckBox.setChecked(self.receiver is None)
+
         saveLocButton = QPushButton('Save File Location')
         saveLocButton.clicked.connect(self.savePathDialog)
         self.saveLocLineForm = QLineEdit()
@@ -63,14 +76,17 @@ class MergeData(QWidget):
         grid.addWidget(sepOutLabel, 1, 3, 1, 1)
         grid.addWidget(self.sepOutCB, 1, 4, 1, 1)
 
-        grid.addWidget(saveLocButton, 2, 1, 1, 1)
-        grid.addWidget(self.saveLocLineForm, 2, 2, 1, 3)
+        grid.addWidget(self.exportCheckBox, 2, 1, 1, 1)
+        grid.addWidget(saveLocButton, 2, 2, 1, 1)
+        grid.addWidget(self.saveLocLineForm, 2, 3, 1, 2)
 
         grid.addWidget(self.table, 3, 1, 97, 4)
 
         vbox.addStretch(1)
         grid.addLayout(vbox, 101, 1)
         # grid.addWidget(self.closeCheckBox, 102, 1, 1, 2)
+        grid.addWidget(formatLabel, 102, 1, 1, 1)
+        grid.addWidget(self.formatCB, 102, 2, 1, 1)
         grid.addWidget(self.startButton, 102, 3, 1, 1)
         grid.addWidget(closeButton, 102, 4, 1, 1)
         self.setLayout(grid)
@@ -84,144 +100,17 @@ class MergeData(QWidget):
     #         self.closeState.setText('unchecked')
 
 
-    def loadDataDialog(self):
-
-        loadData = QDialog()
-        loadData.setWindowTitle('Load Data')
-        loadData.setWindowIcon(QIcon('load-pngrepo-com.png'))
-
-        openFilesButton = QPushButton('Open File(s)')
-        openFilesButton.clicked.connect(self.filesDialog)
-        openFolderButton = QPushButton('Open Folder')
-        openFolderButton.clicked.connect(self.folderDialog)
-
-        sepInLabel = QLabel('Separator:')
-        self.sepInCB = QComboBox()
-        self.sepInCB.addItems(['Tab', 'Comma', 'Space', 'Semicolon'])
-
-        textTypeLabel = QLabel('Text Type')
-        self.textTypeCB = QComboBox()
-        self.textTypeCB.addItems(['.txt', '.csv', '.dat'])
-
-        headerLineLabel = QLabel('Header Starting Line:')
-        self.headerLineSB = QSpinBox()
-        self.headerLineSB.setMinimum(1)
-
-        dataLineLabel = QLabel('Data Starting Line:')
-        self.dataLineSB = QSpinBox()
-        self.dataLineSB.setMinimum(1)
-
-        locLabel = QLabel('Location:')
-        self.locList = QTextBrowser()
-
-        self.showCheckBox = QCheckBox('Show All Data to Table')
-        self.showCheckBox.setChecked(False)
-        self.showCheckBox.toggled.connect(self.showCheckBoxState)
-        self.showState = QLabel()
-
-        cancelButton = QPushButton('Cancel')
-        cancelButton.clicked.connect(loadData.close)
-        loadButton = QPushButton('Load')
-        loadButton.clicked.connect(self.loadAction)
-        loadButton.clicked.connect(loadData.close)
-
-        grid = QGridLayout()
-        grid.addWidget(openFilesButton, 1, 1, 1, 2)
-        grid.addWidget(openFolderButton, 1, 3, 1, 2)
-
-        grid.addWidget(sepInLabel, 2, 1, 1, 1)
-        grid.addWidget(self.sepInCB, 2, 2, 1, 1)
-        grid.addWidget(textTypeLabel, 2, 3, 1, 1)
-        grid.addWidget(self.textTypeCB, 2, 4, 1, 1)
-
-        grid.addWidget(headerLineLabel, 3, 1, 1, 1)
-        grid.addWidget(self.headerLineSB, 3, 2, 1, 1)
-        grid.addWidget(dataLineLabel, 3, 3, 1, 1)
-        grid.addWidget(self.dataLineSB, 3, 4, 1, 1)
-
-        grid.addWidget(locLabel, 4, 1, 1, 1)
-
-        grid.addWidget(self.locList, 5, 1, 10, 4)
-
-        grid.addWidget(self.showCheckBox, 15, 1, 1, 2)
-        grid.addWidget(loadButton, 15, 3, 1, 1)
-        grid.addWidget(cancelButton, 15, 4, 1, 1)
-
-        loadData.setLayout(grid)
-
-        loadData.exec_()
-
-    def showCheckBoxState(self):
-
-        if self.showCheckBox.isChecked() == True:
-            self.showState.setText(self.showCheckBox.text())
-        else:
-            self.showState.setText('unchecked')
-
-    def filesDialog(self):
-
-        home_dir = str(Path.home())
-        fileFilter = 'All Files (*.*) ;; Text Files (*.txt) ;; Comma Separated Value (*.csv) ;; DAT Files (*.dat)'
-        selectedFilter = 'Text Files (*.txt)'
-        fname = QFileDialog.getOpenFileNames(self, 'Open File(s)', home_dir, fileFilter, selectedFilter)
-        global filesList
-        filesList = fname[0]
-
-        fileListPrint = ''
-
-        for file in filesList:
-            fileListPrint += file + '\n'
-
-        self.locList.setText(fileListPrint)
-
-    def folderDialog(self):
-
-        home_dir = str(Path.home())
-        fname = QFileDialog.getExistingDirectory(self, 'Open Folder', home_dir)
-
-        textTypeDict = {'.txt': '.[Tt][Xx][Tt]', '.csv': '.[Cc][Ss][Vv]', '.dat': '.[Dd][Aa][Tt]'}
-        textTypeSelect = textTypeDict[self.textTypeCB.currentText()]
-
-        pathName = fname + '/**/*' + textTypeSelect
-
-        global filesList
-        filesList = glob.glob(pathName, recursive=True)
-
-        fileListPrint = ''
-
-        for file in filesList:
-            fileListPrint += file + '\n'
-
-        self.locList.setText(fileListPrint)
-
-    def loadDataDict(self):
-
-        head = self.headerLineSB.value() - 1
-        start_data = self.dataLineSB.value() - 1
-        sepInDict = {'Tab': '\t', 'Comma': ',', 'Space': ' ', 'Semicolon': ';'}
-        sepInSelect = sepInDict[self.sepInCB.currentText()]
-
-        dummy = []
-
-        for file in filesList:
-            raw_single = pd.read_csv(file, sep=sepInSelect, header=head)
-            raw_single = raw_single.iloc[start_data:, 0:]
-
-            dummy.append(raw_single)
-
-        global raw
-        raw = pd.concat(dummy, ignore_index=True, sort=False)
-
-        return raw
-
     def loadAction(self):
 
-        raw = self.loadDataDict()
+        dataset = self.loadDataDict()
+
+        if dataset is None:
+            return
 
         if self.showState.text() == 'Show All Data to Table':
-            data = raw
+            data = dataset.frame()
         else:
-            data = raw.head(100)
+            data = dataset.frame(100)
 
         self.table.setColumnCount(len(data.columns))
         self.table.setRowCount(len(data.index))
@@ -247,12 +136,35 @@ class MergeData(QWidget):
 
     def startMerge(self):
 
+        if self.dataset is None:
+            return
+
+        # The analysis gets the dataset itself, no text is written and parsed again.
+        if self.receiver is not None:
+            self.receiver(self.dataset, self.filesList)
+
+        if not self.exportCheckBox.isChecked():
+            return
+
         save_file = self.saveLocLineForm.text()
         sepOutDict = {'Tab': '\t', 'Comma': ',', 'Semicolon': ';'}
         sepOutSelect = sepOutDict[self.sepOutCB.currentText()]
-        data = raw.copy()
+        data = self.dataset.frame()
+
+        try:
+            tide_io.writeTable(data, save_file, self.formatCB.currentText(), sepOutSelect)
+        except ImportError as e:
+            self.formatWarning(str(e))
+
+    def formatWarning(self, message):
+
+        formatWarning = QMessageBox()
+        formatWarning.setWindowTitle('Warning')
+        formatWarning.setIcon(QMessageBox.Critical)
+        formatWarning.setText('Output format is not available, install its python module or select "Text".')
+        formatWarning.setDetailedText(message)
 
-        data.to_csv(save_file, sep=sepOutSelect, index=False)
+        formatWarning.exec_()
 
 
 
@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+import numpy as np
+import pandas as pd
+from matplotlib.dates import date2num
+import tide_harmonic
+
+
+
+BATCH_WINDOW = 0.005
+MAX_BODY = 64 * 1024 ** 2
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def timeNum(times):
+    '''Request times (ISO strings or unix seconds) as the day numbers used by the solvers'''
+
+    times = list(times)
+
+    if len(times) > 0 and all(isinstance(t, (int, float)) for t in times):
+        index = pd.to_datetime(np.asarray(times, dtype='float64'), unit='s')
+    else:
+        index = pd.to_datetime(times)
+
+    return date2num(index.values)
+
+
+class Batcher:
+    '''
+    Prediction queue of one station. Requests arriving within the batch window
+    are concatenated and synthesized in a single vectorized evaluation.
+    '''
+
+    def __init__(self, model, window=BATCH_WINDOW):
+
+        self.model = model
+        self.window = window
+        self.pending = []
+        self.task = None
+        self.requests = 0
+        self.batches = 0
+
+    async def predict(self, time_num):
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((time_num, future))
+
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.flush())
+
+        return await future
+
+    async def flush(self):
+
+        await asyncio.sleep(self.window)
+        pending, self.pending, self.task = self.pending, [], None
+
+        times = np.concatenate([time_num for time_num, _ in pending])
+
+        try:
+            # numpy releases the GIL, synthesis runs off the event loop
+            level = await asyncio.get_running_loop().run_in_executor(None, tide_harmonic.synthesize,
+                                                                     self.model, times)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        self.requests += len(pending)
+        self.batches += 1
+        offset = 0
+
+        for time_num, future in pending:
+            future.set_result(level[offset:offset + len(time_num)])
+            offset += len(time_num)
+
+
+class PredictionService:
+    '''
+    Local HTTP/JSON prediction service over fitted harmonic models.
+
+    GET  /stations            station names
+    GET  /stats               requests and batches per station
+    POST /predict             {"station": name, "times": [ISO strings or unix seconds]}
+    '''
+
+    def __init__(self, models, window=BATCH_WINDOW):
+
+        self.batchers = {name: Batcher(model, window) for name, model in models.items()}
+
+    async def route(self, method, target, body):
+
+        path = urlsplit(target).path
+
+        if path == '/stations':
+            return 200, {'stations': sorted(self.batchers)}
+
+        elif path == '/stats':
+            return 200, {name: {'requests': b.requests, 'batches': b.batches} for name, b in self.batchers.items()}
+
+        elif path == '/predict':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+
+            request = json.loads(body)
+            station = request['station']
+
+            if station not in self.batchers:
+                return 404, {'error': 'unknown station ' + str(station)}
+
+            level = await self.batchers[station].predict(timeNum(request['times']))
+            heights = [None if np.isnan(h) else float(h) for h in level]
+
+            return 200, {'station': station, 'heights': heights}
+
+        else:
+            return 404, {'error': 'unknown path ' + path}
+
+    async def handle(self, reader, writer):
+        '''One HTTP/1.1 request per connection'''
+
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+
+            length = int(headers.get('content-length', 0))
+
+            if length > MAX_BODY:
+                status, payload = 413, {'error': 'request body too large'}
+            else:
+                body = await reader.readexactly(length) if length > 0 else b''
+                status, payload = await self.route(method, target, body)
+
+        except (ValueError, KeyError, TypeError) as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': str(e)}
+
+        data = json.dumps(payload).encode()
+        head = 'HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'
+        writer.write(head.format(status, STATUS_TEXT[status], len(data)).encode('latin-1') + data)
+
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765, socket_path=None):
+        '''Listening server on localhost, or on a Unix socket if a path is given'''
+
+        if socket_path is not None:
+            return await asyncio.start_unix_server(self.handle, path=socket_path)
+        else:
+            return await asyncio.start_server(self.handle, host, port)
+
+
+async def serve(models, host, port, socket_path, window):
+
+    service = PredictionService(models, window)
+    server = await service.start(host, port, socket_path)
+
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Local tide prediction service')
+    parser.add_argument('stations', nargs='+', help='NAME=MODEL.json (or .npz), a model saved by "Analyse Tide"')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', default=None, help='serve on a Unix socket instead of TCP')
+    parser.add_argument('--window', type=float, default=BATCH_WINDOW, help='batch window in seconds')
+    args = parser.parse_args()
+
+    models = {}
+
+    for station in args.stations:
+        name, _, path = station.rpartition('=')
+        if name == '':
+            name = os.path.basename(path).split('.')[0]
+        models[name] = tide_harmonic.loadModel(path)
+
+    try:
+        asyncio.run(serve(models, args.host, args.port, args.socket, args.window))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
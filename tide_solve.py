@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from matplotlib.dates import date2num, get_epoch
+from utide import solve, reconstruct
+
+
+
+def ordinalOffset():
+    '''
+    Days from the matplotlib epoch of date2num (1970 by default) to 1 January of year 1,
+    the time base (proleptic Gregorian ordinals) of the astronomical arguments
+    '''
+
+    epoch = datetime(1970, 1, 1)
+
+    return epoch.toordinal() - date2num(epoch)
+
+
+def ordinalDays(time_num):
+    '''date2num day numbers as proleptic Gregorian ordinals, as T Tide and utide.harmonics expect'''
+
+    return np.asarray(time_num, dtype='float64') + ordinalOffset()
+
+
+def ttideSolve(ad, dt, stime, lat, constitnames=None):
+    '''T Tide analysis of an evenly spaced series, stime is a date2num day number'''
+
+    # Imported here, so prediction from saved models (tide_service) runs without T Tide installed.
+    from ttide import t_tide
+
+    return t_tide(ad, dt=dt, stime=float(ordinalDays(stime)), lat=lat, constitnames=constitnames, synth=0)
+
+
+def utideSolve(time_num, ad, lat, constit='auto'):
+    '''U Tide analysis, times are date2num day numbers (not milliseconds)'''
+
+    return solve(time_num, ad, lat=lat, constit=constit, trend=False, method='robust', epoch=get_epoch())
+
+
+def ttideRun(ad, dt, stime, lat, constitnames, time_predic_num):
+    '''T Tide analysis and prediction, run in a worker process'''
+
+    coef = ttideSolve(ad, dt, stime, lat, constitnames)
+    msl = coef['z0']
+
+    return {'coef':coef, 'prediction':coef(ordinalDays(time_predic_num)) + msl, 'MSL':msl}
+
+
+def utideRun(time_num, ad, lat, constit, time_predic_num):
+    '''U Tide analysis and prediction, run in a worker process'''
+
+    coef = utideSolve(time_num, ad, lat, constit)
+    predic = reconstruct(time_predic_num, coef, min_SNR=0, epoch=get_epoch())
+
+    return {'coef':coef, 'prediction':predic['h'], 'MSL':coef.mean}
+
+
+def constituentName(name):
+
+    if isinstance(name, bytes):
+        name = name.decode()
+
+    return str(name).strip()
+
+
+def constituentTable(coef, method):
+    '''Amplitude and phase of every fitted constituent, indexed by name'''
+
+    if method == 'T Tide':
+        names = [constituentName(name) for name in coef['nameu']]
+        tidecon = np.asarray(coef['tidecon'])
+        table = pd.DataFrame({'A':tidecon[:, 0], 'g':tidecon[:, 2]}, index=names)
+    else:
+        names = [constituentName(name) for name in coef.name]
+        table = pd.DataFrame({'A':np.asarray(coef.A), 'g':np.asarray(coef.g)}, index=names)
+
+    table.index.name = 'name'
+
+    return table
+
+
+def compareTables(ttide_table, utide_table):
+    '''Side by side constituents of both methods with amplitude and phase differences'''
+
+    table = ttide_table.join(utide_table, how='outer', lsuffix=' T Tide', rsuffix=' U Tide')
+    table['dA'] = table['A U Tide'] - table['A T Tide']
+    table['dg'] = (table['g U Tide'] - table['g T Tide'] + 180) % 360 - 180
+
+    return table.sort_values('A T Tide', ascending=False)
+
+
+def compareStats(ttide_prediction, utide_prediction):
+    '''Difference statistics of two predictions on the same times'''
+
+    diff = np.asarray(utide_prediction) - np.asarray(ttide_prediction)
+    valid = ~np.isnan(diff)
+
+    return {'mean difference':np.mean(diff[valid]),
+            'RMS difference':np.sqrt(np.mean(diff[valid] ** 2)),
+            'max difference':np.max(np.abs(diff[valid])),
+            'correlation':np.corrcoef(np.asarray(ttide_prediction)[valid],
+                                      np.asarray(utide_prediction)[valid])[0, 1]}
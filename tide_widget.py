@@ -1,8 +1,10 @@
 #!/usr/bin/python3
 
 import sys
+import os
+from time import perf_counter
 from pathlib import Path
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import (QApplication, QWidget, QTextBrowser, QLineEdit, QFileDialog, QDialog,
                              QGridLayout, QMessageBox, QVBoxLayout, QComboBox, QLabel, QCheckBox,
                              QPushButton, QCalendarWidget, QDoubleSpinBox, QSpinBox, QRadioButton,
@@ -10,30 +12,49 @@ from PyQt5.QtWidgets import (QApplication, QWidget, QTextBrowser, QLineEdit, QFi
 from PyQt5.QtGui import QIcon
 import pandas as pd
 import numpy as np
-from ttide import t_tide, t_utils
-from utide import solve, reconstruct
-from matplotlib.dates import date2num
+from ttide import t_utils
+from matplotlib.dates import date2num, num2date
 import matplotlib.pyplot as plt
 from pandas.plotting import register_matplotlib_converters
 register_matplotlib_converters()
+import tide_load
 import tide_merge
+import tide_io
+import tide_data
+import tide_const
+import tide_solve
+import tide_harmonic
+import tide_filter
+from concurrent.futures import ProcessPoolExecutor
 from statistics import mode
-import glob
 
 
+MONITOR_SAMPLES = 20000
+MONITOR_REFRESH = 1000
+STREAM_BUDGET = 256
 
-class TideWidget(QWidget):
+
+
+class TideWidget(tide_load.DataLoader, QWidget):
 
     def __init__(self):
         super(TideWidget, self).__init__()
 
+        self.initLoader()
+        self.streamBudget = STREAM_BUDGET * 1024 ** 2
+        self.workspace = tide_data.Workspace()
+        self.station = None
+        self.tileCache = tide_harmonic.TileCache()
+        self.monitorState = None
+
         self.initUI()
 
 
     def mergeData(self):
-        '''Calling data merger (tide_merge.py)'''
+        '''Calling data merger (tide_merge.py), the merged dataset is handed over in memory'''
 
-        tide_merge.main()
+        self.mergeWindow = tide_merge.MergeData(receiver=self.addStation)
+        self.mergeWindow.show()
 
 
     def initUI(self):
@@ -50,6 +71,8 @@ class TideWidget(QWidget):
         mergeButton.clicked.connect(self.mergeData)
         plotObsButton = QPushButton('Plot Observation Data')
         plotObsButton.clicked.connect(self.plotLoad)
+        spectrumButton = QPushButton('Spectrum')
+        spectrumButton.clicked.connect(self.spectrum)
 
         timeHeaderLabel = QLabel('Time Header:')
         self.timeHeaderCB = QComboBox()
@@ -61,6 +84,11 @@ class TideWidget(QWidget):
         self.dayFirstCB = QComboBox()
         self.dayFirstCB.addItems(['True', 'False'])
 
+        duplicateLabel = QLabel('Duplicates:')
+        self.duplicateCB = QComboBox()
+        self.duplicateCB.addItems(list(tide_io.DUPLICATE_POLICIES))
+        self.mergeLabel = QLabel()
+
         self.table = QTableWidget()
         scroll = QScrollArea()
         scroll.setWidget(self.table)
@@ -102,8 +130,30 @@ class TideWidget(QWidget):
 
         solveButton = QPushButton('Analyse Tide')
         solveButton.clicked.connect(self.analyse)
-        predicButton = QPushButton('Predict Tide')
-        predicButton.clicked.connect(self.predict)
+        self.predicButton = QPushButton('Predict Tide')
+        self.predicButton.clicked.connect(self.predict)
+        compareButton = QPushButton('Compare Methods')
+        compareButton.clicked.connect(self.compare)
+        hindcastButton = QPushButton('Hindcast')
+        hindcastButton.clicked.connect(self.hindcast)
+        datumButton = QPushButton('Tidal Datums')
+        datumButton.clicked.connect(self.datums)
+        tideTableButton = QPushButton('Tide Table')
+        tideTableButton.clicked.connect(self.tideTable)
+        monitorButton = QPushButton('Monitor File')
+        monitorButton.clicked.connect(self.monitor)
+        timesButton = QPushButton('Predict at Times')
+        timesButton.clicked.connect(self.predictTimes)
+        coefficientButton = QPushButton('Predict from File')
+        coefficientButton.clicked.connect(self.predictFromFile)
+        self.filterCB = QComboBox()
+        self.filterCB.addItems(list(tide_filter.FILTERS))
+        filterButton = QPushButton('Tidal Filter')
+        filterButton.clicked.connect(self.tidalFilter)
+        cutoffLabel = QLabel('Low-pass Cutoff (h):')
+        self.cutoffSB = QSpinBox()
+        self.cutoffSB.setRange(2, 8760)
+        self.cutoffSB.setValue(tide_filter.LOWPASS_CUTOFF)
 
         self.saveCheckBox = QCheckBox('Save Prediction')
         self.saveCheckBox.setChecked(True)
@@ -115,6 +165,34 @@ class TideWidget(QWidget):
         self.plotCheckBox.toggled.connect(self.checkBox)
         self.plotState = QLabel(self.plotCheckBox.text())
 
+        formatLabel = QLabel('Output Format:')
+        self.formatCB = QComboBox()
+        self.formatCB.addItems(list(tide_io.OUTPUT_FORMATS))
+
+        self.constitCheckBox = QCheckBox('Select Constituents')
+        self.constitCheckBox.setChecked(False)
+        self.constitLabel = QLabel()
+        includeLabel = QLabel('Include:')
+        self.includeLineForm = QLineEdit()
+        excludeLabel = QLabel('Exclude:')
+        self.excludeLineForm = QLineEdit()
+
+        self.bootstrapCheckBox = QCheckBox('Bootstrap Confidence')
+        self.bootstrapCheckBox.setChecked(False)
+        self.bootstrapCheckBox.setToolTip('Confidence intervals from resampled residuals, saved by "Analyse Tide"')
+        realizationLabel = QLabel('Realizations:')
+        self.realizationSB = QSpinBox()
+        self.realizationSB.setRange(10, 100000)
+        self.realizationSB.setValue(tide_harmonic.BOOT_REALIZATIONS)
+
+        stationLabel = QLabel('Station:')
+        self.stationCB = QComboBox()
+        self.stationCB.activated[str].connect(self.switchStation)
+        budgetLabel = QLabel('Memory Budget (MB):')
+        self.budgetSB = QSpinBox()
+        self.budgetSB.setRange(64, 1048576)
+        self.budgetSB.setValue(self.workspace.budget // 1024 ** 2)
+        self.budgetSB.valueChanged.connect(self.budgetChange)
 
         howToButton = QPushButton('How To Use')
         howToButton.clicked.connect(self.howToDialog)
@@ -129,198 +207,268 @@ class TideWidget(QWidget):
 
         grid.addWidget(dayFirstLabel, 2, 1, 1, 1)
         grid.addWidget(self.dayFirstCB, 2, 2, 1, 1)
-        grid.addWidget(plotObsButton, 2, 3, 1, 2)
+        grid.addWidget(plotObsButton, 2, 3, 1, 1)
+        grid.addWidget(spectrumButton, 2, 4, 1, 1)
 
         grid.addWidget(timeHeaderLabel, 3, 1, 1, 1)
         grid.addWidget(self.timeHeaderCB, 3, 2, 1, 1)
         grid.addWidget(depthHeaderLabel, 3, 3, 1, 1)
         grid.addWidget(self.depthHeaderCB, 3, 4, 1, 1)
 
-        grid.addWidget(self.table, 4, 1, 5, 4)
+        grid.addWidget(duplicateLabel, 4, 1, 1, 1)
+        grid.addWidget(self.duplicateCB, 4, 2, 1, 1)
+        grid.addWidget(self.mergeLabel, 4, 3, 1, 2)
+
+        grid.addWidget(self.table, 5, 1, 5, 4)
+
+        grid.addWidget(self.methodLabel, 10, 1, 1, 2)
+        grid.addWidget(tideAnalysisLabel, 10, 3, 1, 2)
+
+        grid.addWidget(self.ttideButton, 11, 1, 1, 2)
+        grid.addWidget(self.utideButton, 11, 3, 1, 2)
+
+        grid.addWidget(latLabel, 12, 1, 1, 1)
+        grid.addWidget(self.latDSB, 12, 2, 1, 1)
+        grid.addWidget(saveLocButton, 12, 3, 1, 1)
+        grid.addWidget(self.saveLocLineForm, 12, 4, 1, 1)
+
+        grid.addWidget(startcalLabel, 13, 1, 1, 2)
+        grid.addWidget(endcalLabel, 13, 3, 1, 2)
+
+        grid.addWidget(self.startcal, 14, 1, 1, 2)
+        grid.addWidget(self.endcal, 14, 3, 1, 2)
 
-        grid.addWidget(self.methodLabel, 9, 1, 1, 2)
-        grid.addWidget(tideAnalysisLabel, 9, 3, 1, 2)
+        grid.addWidget(freqLabel, 15, 1, 1, 1)
+        grid.addWidget(self.freqSB, 15, 2, 1, 2)
+        grid.addWidget(self.freqUnitCB, 15, 4, 1, 1)
 
-        grid.addWidget(self.ttideButton, 10, 1, 1, 2)
-        grid.addWidget(self.utideButton, 10, 3, 1, 2)
+        grid.addWidget(self.saveCheckBox, 16, 2, 1, 1)
+        grid.addWidget(self.plotCheckBox, 16, 3, 1, 1)
+        grid.addWidget(solveButton, 16, 1, 1, 1)
+        grid.addWidget(self.predicButton, 16, 4, 1, 1)
 
-        grid.addWidget(latLabel, 11, 1, 1, 1)
-        grid.addWidget(self.latDSB, 11, 2, 1, 1)
-        grid.addWidget(saveLocButton, 11, 3, 1, 1)
-        grid.addWidget(self.saveLocLineForm, 11, 4, 1, 1)
+        grid.addWidget(formatLabel, 17, 1, 1, 1)
+        grid.addWidget(self.formatCB, 17, 2, 1, 1)
+        grid.addWidget(compareButton, 17, 3, 1, 1)
+        grid.addWidget(hindcastButton, 17, 4, 1, 1)
 
-        grid.addWidget(startcalLabel, 12, 1, 1, 2)
-        grid.addWidget(endcalLabel, 12, 3, 1, 2)
+        grid.addWidget(self.constitCheckBox, 18, 1, 1, 1)
+        grid.addWidget(self.constitLabel, 18, 2, 1, 3)
+        grid.addWidget(includeLabel, 19, 1, 1, 1)
+        grid.addWidget(self.includeLineForm, 19, 2, 1, 1)
+        grid.addWidget(excludeLabel, 19, 3, 1, 1)
+        grid.addWidget(self.excludeLineForm, 19, 4, 1, 1)
 
-        grid.addWidget(self.startcal, 13, 1, 1, 2)
-        grid.addWidget(self.endcal, 13, 3, 1, 2)
+        grid.addWidget(stationLabel, 20, 1, 1, 1)
+        grid.addWidget(self.stationCB, 20, 2, 1, 1)
+        grid.addWidget(budgetLabel, 20, 3, 1, 1)
+        grid.addWidget(self.budgetSB, 20, 4, 1, 1)
 
-        grid.addWidget(freqLabel, 14, 1, 1, 1)
-        grid.addWidget(self.freqSB, 14, 2, 1, 2)
-        grid.addWidget(self.freqUnitCB, 14, 4, 1, 1)
 
-        grid.addWidget(self.saveCheckBox, 15, 2, 1, 1)
-        grid.addWidget(self.plotCheckBox, 15, 3, 1, 1)
-        grid.addWidget(solveButton, 15, 1, 1, 1)
-        grid.addWidget(predicButton, 15, 4, 1, 1)
+        grid.addWidget(datumButton, 21, 1, 1, 2)
+        grid.addWidget(tideTableButton, 21, 3, 1, 2)
 
+        grid.addWidget(self.bootstrapCheckBox, 22, 1, 1, 2)
+        grid.addWidget(realizationLabel, 22, 3, 1, 1)
+        grid.addWidget(self.realizationSB, 22, 4, 1, 1)
+
+        grid.addWidget(monitorButton, 23, 1, 1, 2)
+        grid.addWidget(timesButton, 23, 3, 1, 2)
+
+        grid.addWidget(coefficientButton, 24, 1, 1, 2)
+        grid.addWidget(self.filterCB, 24, 3, 1, 1)
+        grid.addWidget(filterButton, 24, 4, 1, 1)
+        grid.addWidget(cutoffLabel, 25, 3, 1, 1)
+        grid.addWidget(self.cutoffSB, 25, 4, 1, 1)
 
         vbox.addStretch(1)
-        grid.addLayout(vbox, 20, 1)
-        grid.addWidget(howToButton, 21, 1, 1, 2)
-        grid.addWidget(aboutButton, 21, 3, 1, 2)
+        grid.addLayout(vbox, 26, 1)
+        grid.addWidget(howToButton, 27, 1, 1, 2)
+        grid.addWidget(aboutButton, 27, 3, 1, 2)
         self.setLayout(grid)
 
 
-    def loadDataDialog(self):
-        '''Load Data Widget UI'''
+    def loadOptions(self, grid, row):
+        '''Streaming options of the Load Data dialog'''
 
-        loadData = QDialog()
-        loadData.setWindowTitle('Load Data')
-        loadData.setWindowIcon(QIcon('load-pngrepo-com.png'))
+        self.streamCheckBox = QCheckBox('Stream to Disk')
+        self.streamCheckBox.setChecked(False)
+        self.streamCheckBox.setToolTip('Read time and depth in chunks into files on disk, for records larger than RAM')
+        streamBudgetLabel = QLabel('RAM Budget (MB):')
+        self.streamBudgetSB = QSpinBox()
+        self.streamBudgetSB.setRange(16, 65536)
+        self.streamBudgetSB.setValue(self.streamBudget // 1024 ** 2)
+        aggregateLabel = QLabel('Average to (min):')
+        self.aggregateSB = QSpinBox()
+        self.aggregateSB.setRange(0, 1440)
+        self.aggregateSB.setValue(0)
+        self.aggregateSB.setToolTip('0 keeps every record')
+        streamTimeLabel = QLabel('Time Column:')
+        self.streamTimeCB = QComboBox()
+        streamDepthLabel = QLabel('Depth Column:')
+        self.streamDepthCB = QComboBox()
 
-        openFilesButton = QPushButton('Open File(s)')
-        openFilesButton.clicked.connect(self.filesDialog)
-        openFolderButton = QPushButton('Open Folder')
-        openFolderButton.clicked.connect(self.folderDialog)
+        grid.addWidget(self.streamCheckBox, row, 1, 1, 2)
+        grid.addWidget(aggregateLabel, row, 3, 1, 1)
+        grid.addWidget(self.aggregateSB, row, 4, 1, 1)
+        grid.addWidget(streamBudgetLabel, row + 1, 3, 1, 1)
+        grid.addWidget(self.streamBudgetSB, row + 1, 4, 1, 1)
+        grid.addWidget(streamTimeLabel, row + 2, 1, 1, 1)
+        grid.addWidget(self.streamTimeCB, row + 2, 2, 1, 1)
+        grid.addWidget(streamDepthLabel, row + 2, 3, 1, 1)
+        grid.addWidget(self.streamDepthCB, row + 2, 4, 1, 1)
 
-        sepLabel = QLabel('Separator:')
-        self.sepCB = QComboBox()
-        self.sepCB.addItems(['Tab', 'Comma', 'Space', 'Semicolon'])
+        return row + 3
 
-        textTypeLabel = QLabel('Text Type')
-        self.textTypeCB = QComboBox()
-        self.textTypeCB.addItems(['.txt', '.csv', '.dat'])
 
-        headerLineLabel = QLabel('Header Starting Line:')
-        self.headerLineSB = QSpinBox()
-        self.headerLineSB.setMinimum(1)
+    def filesSelected(self):
+        '''Columns of the first selected file to stream, the likely time and depth preselected'''
 
-        dataLineLabel = QLabel('Data Starting Line:')
-        self.dataLineSB = QSpinBox()
-        self.dataLineSB.setMinimum(1)
+        layout = tide_io.sniffFile(self.filesList[0]) if len(self.filesList) > 0 else None
+        columns = layout['columns'] if layout is not None else []
+        defaults = tide_io.seriesHeaders(layout)
 
-        locLabel = QLabel('Location:')
-        self.locList = QTextBrowser()
+        for combo, default in zip((self.streamTimeCB, self.streamDepthCB), defaults):
+            combo.clear()
+            combo.addItems(columns)
+            if default is not None:
+                combo.setCurrentText(default)
 
-        self.showCheckBox = QCheckBox('Show All Data to Table')
-        self.showCheckBox.setChecked(False)
-        self.showCheckBox.toggled.connect(self.showCheckBoxState)
-        self.showState = QLabel()
 
-        cancelButton = QPushButton('Cancel')
-        cancelButton.clicked.connect(loadData.close)
-        loadButton = QPushButton('Load')
-        loadButton.clicked.connect(self.loadAction)
-        loadButton.clicked.connect(loadData.close)
+    def readDataset(self, layouts):
+        '''Selected files read in full, or streamed to disk'''
 
-        grid = QGridLayout()
-        grid.addWidget(openFilesButton, 1, 1, 1, 2)
-        grid.addWidget(openFolderButton, 1, 3, 1, 2)
+        self.streamBudget = self.streamBudgetSB.value() * 1024 ** 2
 
-        grid.addWidget(sepLabel, 2, 1, 1, 1)
-        grid.addWidget(self.sepCB, 2, 2, 1, 1)
-        grid.addWidget(textTypeLabel, 2, 3, 1, 1)
-        grid.addWidget(self.textTypeCB, 2, 4, 1, 1)
+        if self.streamCheckBox.isChecked():
+            return self.streamDataset(layouts)
 
-        grid.addWidget(headerLineLabel, 3, 1, 1, 1)
-        grid.addWidget(self.headerLineSB, 3, 2, 1, 1)
-        grid.addWidget(dataLineLabel, 3, 3, 1, 1)
-        grid.addWidget(self.dataLineSB, 3, 4, 1, 1)
+        return super(TideWidget, self).readDataset(layouts)
 
-        grid.addWidget(locLabel, 4, 1, 1, 1)
 
-        grid.addWidget(self.locList, 5, 1, 10, 4)
+    def seriesLayout(self, path, time, depth):
+        '''Layout detected in a file holding the time and depth columns, None if it lacks them'''
 
-        grid.addWidget(self.showCheckBox, 15, 1, 1, 2)
-        grid.addWidget(loadButton, 15, 3, 1, 1)
-        grid.addWidget(cancelButton, 15, 4, 1, 1)
+        detected = tide_io.sniffFile(path)
+        columns = detected['columns'] if detected is not None else []
+        missing = [c for c in (time, depth) if c not in columns]
 
-        loadData.setLayout(grid)
+        if len(missing) > 0:
+            self.loadWarning(['{}: no column {}, found: {}.'.format(path, ', '.join(missing), ', '.join(columns))])
+            return None
 
-        loadData.exec_()
+        return detected
 
 
-    def showCheckBoxState(self):
+    def streamDataset(self, layouts):
+        '''Selected time and depth columns of every file streamed in chunks into memory-mapped columns'''
 
-        if self.showCheckBox.isChecked() == True:
-            self.showState.setText(self.showCheckBox.text())
-        else:
-            self.showState.setText('unchecked')
+        time = self.streamTimeCB.currentText()
+        depth = self.streamDepthCB.currentText()
+        missing = [c for c in (time, depth) if c not in layouts[0]['columns']]
+
+        if len(missing) > 0 or time == depth:
+            self.loadWarning(['Select two different time and depth columns of the files to stream, found: ' +
+                              ', '.join(layouts[0]['columns'])])
+            return None
 
+        dayF = self.str2bool(self.dayFirstCB.currentText())
+        step = self.aggregateSB.value()
 
-    def filesDialog(self):
-        '''Load from files Dialog'''
+        streams = []
 
-        home_dir = str(Path.home())
-        fileFilter = 'All Files (*.*) ;; Text Files (*.txt) ;; Comma Separated Value (*.csv) ;; DAT Files (*.dat)'
-        selectedFilter = 'Text Files (*.txt)'
-        fname = QFileDialog.getOpenFileNames(self, 'Open File(s)', home_dir, fileFilter, selectedFilter)
+        for file, layout in zip(self.filesList, layouts):
+            chunks = tide_io.streamFile(file, layout['sep'], layout['header'], layout['data_start'],
+                                        time, depth, dayF, self.streamBudget)
+            if step > 0:
+                chunks = tide_io.aggregateChunks(chunks, pd.Timedelta(minutes=step))
+            streams.append(chunks)
 
-        global filesList
-        filesList = fname[0]
+        return tide_data.Dataset.fromStreams(streams, (time, depth), files=self.filesList)
 
-        fileListPrint = ''
 
-        for file in filesList:
-            fileListPrint += file + '\n'
+    def loadAction(self):
+        '''Data loader into Main Widget table'''
 
-        self.locList.setText(fileListPrint)
+        dataset = self.loadDataDict()
 
+        if dataset is None:
+            return
 
-    def folderDialog(self):
-        '''Load from folder Dialog'''
+        self.addStation(dataset, self.filesList)
 
-        home_dir = str(Path.home())
-        fname = QFileDialog.getExistingDirectory(self, 'Open Folder', home_dir)
 
-        textTypeDict = {'.txt': '.[Tt][Xx][Tt]', '.csv': '.[Cc][Ss][Vv]', '.dat': '.[Dd][Aa][Tt]'}
-        textTypeSelect = textTypeDict[self.textTypeCB.currentText()]
+    def addStation(self, dataset, files):
+        '''Loaded or merged data into Main Widget table, as the current station'''
 
-        pathName = fname + '/**/*' + textTypeSelect
+        self.dataset = dataset
+        self.filesList = list(files)
 
-        global filesList
-        filesList = glob.glob(pathName, recursive=True)
+        # Loaded data becomes a station of the workspace, reloading a station replaces it.
+        name = self.stationName(self.filesList)
+        self.station = self.workspace.put(name, dataset)
 
-        fileListPrint = ''
+        if self.stationCB.findText(name) < 0:
+            self.stationCB.addItem(name)
+        self.stationCB.setCurrentText(name)
 
-        for file in filesList:
-            fileListPrint += file + '\n'
+        data = self.showDataset(dataset)
+        self.defaultHeaders(self.filesList, data.columns)
 
-        self.locList.setText(fileListPrint)
 
+    def defaultHeaders(self, files, columns):
+        '''Likely time and depth columns selected, by the column types of the first file'''
 
-    def loadDataDict(self):
-        '''Raw data merger'''
+        if len(files) == 0:
+            return
 
-        head = self.headerLineSB.value() - 1
-        start_data = self.dataLineSB.value() - 1
-        sepDict = {'Tab': '\t', 'Comma': ',', 'Space': ' ', 'Semicolon': ';'}
-        sepSelect = sepDict[self.sepCB.currentText()]
+        time, depth = tide_io.seriesHeaders(tide_io.sniffFile(files[0]), list(columns))
 
-        dummy = []
+        if time is not None:
+            self.timeHeaderCB.setCurrentText(time)
+        if depth is not None:
+            self.depthHeaderCB.setCurrentText(depth)
 
-        for file in filesList:
-            raw_single = pd.read_csv(file, sep=sepSelect, header=head)
-            raw_single = raw_single.iloc[start_data:, 0:]
 
-            dummy.append(raw_single)
+    def stationName(self, files):
+        '''Station name from the loaded file, or from the folder of several files'''
 
-        global raw
-        raw = pd.concat(dummy, ignore_index=True, sort=False)
+        if len(files) == 1:
+            return Path(files[0]).stem
+        else:
+            return Path(files[0]).parent.name
 
-        return raw
 
+    def switchStation(self, name):
+        '''Show a station of the workspace with its last header selection, or the likely headers'''
+
+        self.station = self.workspace.get(name)
+        self.dataset = self.station['dataset']
+        self.filesList = list(self.dataset.files)
+        data = self.showDataset(self.dataset)
+
+        headers = self.station['results'].get('headers')
+
+        if headers is None:
+            self.defaultHeaders(self.filesList, data.columns)
+        else:
+            self.timeHeaderCB.setCurrentText(headers[0])
+            self.depthHeaderCB.setCurrentText(headers[1])
+            self.dayFirstCB.setCurrentText(headers[2])
+
+
+    def budgetChange(self):
+
+        self.workspace.setBudget(self.budgetSB.value() * 1024 ** 2)
 
-    def loadAction(self):
-        '''Data loader into Main Widget table'''
 
-        raw = self.loadDataDict()
+    def showDataset(self, dataset):
+        '''Dataset into Main Widget table and header selections'''
 
         if self.showState.text() == 'Show All Data to Table':
-            data = raw
+            data = dataset.frame()
         else:
-            data = raw.head(100)
+            data = dataset.frame(100)
 
         self.timeHeaderCB.clear()
         self.timeHeaderCB.addItems(data.columns)
@@ -340,6 +488,8 @@ class TideWidget(QWidget):
         self.table.resizeRowsToContents()
         self.table.resizeColumnsToContents()
 
+        return data
+
 
     def savePathDialog(self):
         '''Save file dialog'''
@@ -362,67 +512,68 @@ class TideWidget(QWidget):
         Processing initial input value from Main Widget 
         '''
 
-        data = raw.copy()
-
         time = self.timeHeaderCB.currentText()
         depth = self.depthHeaderCB.currentText()
         dayF = self.str2bool(self.dayFirstCB.currentText())
 
-        data[time] = pd.to_datetime(data[time], dayfirst=dayF)
-        data.index = data[time]
-        data = data.sort_index()
+        policy_name = self.duplicateCB.currentText()
+        policy = tide_io.DUPLICATE_POLICIES[policy_name]
 
-        time_array = data.index
+        # The prepared series of the current station is reused while the selections are unchanged.
+        key = (time, depth, dayF, policy)
+        results = self.station['results'] if self.station is not None else {}
+        results['headers'] = (time, depth, self.dayFirstCB.currentText())
+        cached = results.get('input')
 
-        start_time = time_array[:-1]
-        end_time = time_array[1:]
-        time_diff_array = end_time - start_time
+        if cached is not None and cached[0] == key:
+            self.mergeLabel.setText(cached[2])
+            return cached[1]
 
-        time_diff = mode(time_diff_array)
-        time_diff_float = np.timedelta64(time_diff, 'm').astype('float64')
+        # Only the two used columns are taken from the dataset. Streamed times are already
+        # datetime64 and used as they are, like the depth, text times are parsed into new memory.
+        times = self.dataset.column(time)
 
-        time_gap_div = np.where((time_diff_array > time_diff) & (time_diff_array % time_diff / time_diff == 0))
-        time_gap_undiv = np.where((time_diff_array > time_diff) & (time_diff_array % time_diff / time_diff != 0))
+        if times.dtype.kind != 'M':
+            times = pd.to_datetime(times, dayfirst=dayF)
 
-        start_gap_div = start_time[time_gap_div] + time_diff
-        end_gap_div = end_time[time_gap_div] - time_diff
+        times = np.asarray(times, dtype='datetime64[ns]')
+        data = pd.DataFrame({time:times, depth:self.dataset.column(depth)}, copy=False)
+        order, starts, report = tide_io.mergeRuns(times.view('int64'), self.dataset.bounds)
+        data = tide_io.resolveDuplicates(data, order, starts, depth, policy)
+        data.index = data[time]
 
-        start_gap_undiv = start_time[time_gap_undiv] + time_diff
-        end_gap_undiv = end_time[time_gap_undiv]
+        self.mergeLabel.setText(tide_io.mergeSummary(report, policy_name))
 
-        data_dummy = []
+        time_array = data.index
+        time_diff = mode(time_array[1:] - time_array[:-1])
+        time_diff_float = np.timedelta64(time_diff, 'm').astype('float64')
 
-        for i in range(len(start_gap_div)):
-            if time_gap_div == []:
-                pass
-            else:
-                time_add = pd.date_range(start=start_gap_div[i], end=end_gap_div[i], freq=time_diff)
+        # Gaps are kept as segments, the NaN filled grid is only built for T Tide (gridInput).
+        gaps = tide_io.findGaps(time_array, time_diff)
+        self.mergeLabel.setText(self.mergeLabel.text() + ', ' + tide_io.gapSummary(gaps, time_diff))
 
-                nan_add = pd.DataFrame({time:time_add, depth:pd.Series(np.nan, index=list(range(len(time_add))))})
-                nan_add.index = nan_add[time]
-                nan_add = nan_add.iloc[:, 1:]
-                data_dummy.append(nan_add)
+        input_dict = {'depth':data[depth].values, 'time':time_array, 'interval':time_diff_float,
+                      'step':time_diff, 'gaps':gaps, 'key':key}
+        results['input'] = (key, input_dict, self.mergeLabel.text())
 
-        for i in range(len(start_gap_undiv)):
-            if time_gap_undiv == []:
-                pass
-            else:
-                time_add = pd.date_range(start=start_gap_undiv[i], end=end_gap_undiv[i], freq=time_diff)
+        return input_dict
 
-                nan_add = pd.DataFrame({time: time_add, depth: pd.Series(np.nan, index=list(range(len(time_add))))})
-                nan_add.index = nan_add[time]
-                nan_add = nan_add.iloc[:, 1:]
-                data_dummy.append(nan_add)
 
-        data_add = pd.concat(data_dummy, sort=True)
-        filled = pd.concat([data, data_add], sort=True)
-        filled = filled.sort_index()
-        time_array2 = filled.index
-        depth_array2 = filled[depth].values
+    def gridInput(self, input_dict1):
+        '''Prepared series on the regular grid with NaN in the gaps, as T Tide requires'''
 
-        input_dict = {'depth':depth_array2, 'time':time_array2, 'interval':time_diff_float}
+        results = self.station['results'] if self.station is not None else {}
+        cached = results.get('grid')
 
-        return input_dict
+        if cached is not None and cached[0] == input_dict1['key']:
+            return cached[1]
+
+        time, depth = tide_io.fillGaps(input_dict1['time'], input_dict1['depth'], input_dict1['gaps'],
+                                       input_dict1['step'])
+        grid = dict(input_dict1, time=time, depth=depth)
+        results['grid'] = (input_dict1['key'], grid)
+
+        return grid
 
 
     def inputDict2(self):
@@ -461,6 +612,11 @@ class TideWidget(QWidget):
         ad = input_dict['depth']
         at = input_dict['time']
 
+        # One NaN per gap breaks the line without building the grid.
+        gaps = input_dict['gaps']
+        ad = np.insert(ad.astype('float64'), gaps['after'].values + 1, np.nan)
+        at = np.insert(at.values, gaps['after'].values + 1, gaps['start'].values)
+
         plt.figure(figsize=(10, 5))
         plt.plot(at, ad, label='Tide Observation Data')
         plt.xlabel('Time')
@@ -469,14 +625,54 @@ class TideWidget(QWidget):
         plt.show()
 
 
-    def plotPredic(self, water_level, msl):
+    def spectrum(self):
+        '''Welch spectrum of the observations with the constituents the analysis would fit'''
+
+        input_dict1 = self.inputDict1()
+        interval = input_dict1['interval'] / 60
+
+        freq, density, used = tide_harmonic.spectrum(self.gridInput(input_dict1)['depth'], interval)
+
+        if used == 0:
+            self.spectrumWarning()
+            return
+
+        names = self.constituents(input_dict1)
+
+        if names is None:
+            at = input_dict1['time']
+            names, _ = tide_const.selectConstituents((at[-1] - at[0]) / pd.Timedelta(hours=1), interval)
+
+        self.plotSpectrum(freq, density, used, tide_const.constituentFreqs(names))
+
+
+    def plotSpectrum(self, freq, density, used, constit_freqs):
+        '''Spectrum plotter, constituent frequencies marked'''
+
+        fig, ax = plt.subplots(figsize=(10, 5))
+        ax.semilogy(freq[1:], density[1:], label='Observation Data ({} segments)'.format(used))
+
+        for name, f in constit_freqs.items():
+            ax.axvline(f, color='r', linewidth=0.5, alpha=0.5)
+            ax.text(f, 1, name, rotation=90, fontsize=7, va='top', ha='right', transform=ax.get_xaxis_transform())
+
+        ax.set_xlim(0, freq[-1])
+        ax.set_xlabel('Frequency (cycles per hour)')
+        ax.set_ylabel('Power Spectral Density')
+        ax.legend(loc='lower left')
+        plt.show()
+
+
+    def plotPredic(self, water_level, msl, data_label=None):
         '''Predicted data plotter'''
 
         input_dict2 = self.inputDict2()
 
         ad = water_level
         at = input_dict2['predicted time']
-        data_label = 'Predicted Data using ' + self.methodLabel.text()
+
+        if data_label is None:
+            data_label = 'Predicted Data using ' + self.methodLabel.text()
 
         plt.figure(figsize=(10, 5))
         plt.plot(at, ad, label=data_label)
@@ -517,6 +713,17 @@ class TideWidget(QWidget):
         method = self.methodLabel.text()
         coef = method_dict[method]()
 
+        # Harmonic model next to the report, served by tide_service.py, and as compact binary
+        model = self.harmonicModel(coef, method)
+        tide_harmonic.saveModel(model, os.path.splitext(save_file)[0] + '.model.json')
+        tide_harmonic.saveModel(model, os.path.splitext(save_file)[0] + '.model.npz')
+
+        if self.bootstrapCheckBox.isChecked():
+            input_dict1 = self.inputDict1()
+            time_num = date2num(input_dict1['time'].to_pydatetime())
+            ci = tide_harmonic.confidenceIntervals(model, time_num, input_dict1['depth'], self.realizationSB.value())
+            ci.to_csv(os.path.splitext(save_file)[0] + '.ci.txt', sep='\t')
+
         method = method.replace(' ', '-')
         # text_edit = '_' + method + '_report.txt'
         # save_file = save_file.replace('.txt', text_edit)
@@ -531,6 +738,9 @@ class TideWidget(QWidget):
             'SNR': coef.diagn['SNR']})
             print_coef.index = print_coef['name']
             print_coef = print_coef.iloc[:, 1:]
+            # The mean as Z0, so predictions can be made from the report alone
+            z0 = pd.DataFrame({'frq':[0.0], 'lind':[0], 'A':[coef.mean], 'g':[0.0]}, index=pd.Index(['Z0'], name='name'))
+            print_coef = pd.concat([print_coef, z0])
             print_coef.to_csv(save_file, sep='\t')
 
 
@@ -544,13 +754,41 @@ class TideWidget(QWidget):
         method = self.methodLabel.text()
         prediction = method_dict[method]()
 
-        time = input_dict2['predicted time']
+        self.outputPrediction(prediction['prediction'], prediction['MSL'], save_file)
+
+
+    def predictFromFile(self):
+        '''Prediction from saved coefficients (report or model file), no observations needed'''
+
+        home_dir = str(Path.home())
+        fileFilter = 'Coefficient Files (*.txt *.json *.npz) ;; All Files (*.*)'
+        fname = QFileDialog.getOpenFileName(self, 'Open Coefficients', home_dir, fileFilter)[0]
+
+        if fname == '':
+            return
+
+        input_dict2 = self.inputDict2()
 
-        if method == 'T Tide':
-            water_level = prediction['prediction']
-        elif method == 'U Tide':
-            p_dict = prediction['prediction']
-            water_level = p_dict['h']
+        try:
+            model = tide_harmonic.readCoefficients(fname, input_dict2['latitude'])
+        except (ValueError, KeyError) as e:
+            self.coefficientWarning(fname + ': ' + str(e))
+            return
+
+        if model['lat'] is None:
+            model['lat'] = input_dict2['latitude']
+
+        # Predictions are cached in tiles, repeated forecasts of a station are not synthesized again.
+        water_level = self.tileCache.predict(model, tide_harmonic.modelKey(model), input_dict2['predicted time'])
+        label = 'Predicted Data from ' + os.path.basename(fname)
+
+        self.outputPrediction(water_level, model['mean'], input_dict2['save'], label)
+
+
+    def outputPrediction(self, water_level, msl, save_file, label=None):
+        '''Prediction saved, plotted or shown as selected'''
+
+        time = self.inputDict2()['predicted time']
 
         predic_out = pd.DataFrame({'Time':time, 'Depth':water_level})
 
@@ -560,12 +798,12 @@ class TideWidget(QWidget):
             # text_edit = '_' + method + '.txt'
             # save_file = save_file.replace('.txt', text_edit)
 
-            predic_out.to_csv(save_file, sep='\t', index=False)
+            self.writeOutput(predic_out, save_file, '\t')
         else:
             pass
 
         if self.plotState.text() == 'Plot Prediction':
-            self.plotPredic(water_level, prediction['MSL'])
+            self.plotPredic(water_level, msl, label)
         else:
             pass
 
@@ -573,18 +811,465 @@ class TideWidget(QWidget):
             self.showPredicDialog(predic_out)
 
 
+    def writeOutput(self, data, save_file, sep):
+        '''Write a table in the selected output format'''
+
+        try:
+            tide_io.writeTable(data, save_file, self.formatCB.currentText(), sep)
+        except ImportError as e:
+            self.formatWarning(str(e))
+
+
+    def constituents(self, input_dict1):
+        '''
+        Resolvable constituents for the record length and sampling interval,
+        None to let the solver use its default list
+        '''
+
+        if not self.constitCheckBox.isChecked():
+            self.constitLabel.clear()
+            self.constitLabel.setToolTip('')
+            return None
+
+        at = input_dict1['time']
+        duration = (at[-1] - at[0]) / pd.Timedelta(hours=1)
+        interval = input_dict1['interval'] / 60
+        include = tide_const.parseNames(self.includeLineForm.text())
+        exclude = tide_const.parseNames(self.excludeLineForm.text())
+
+        names, dropped = tide_const.selectConstituents(duration, interval, include=include, exclude=exclude)
+
+        self.constitLabel.setText('{} constituents fitted, {} dropped'.format(len(names), len(dropped)))
+        self.constitLabel.setToolTip(tide_const.dropSummary(dropped))
+
+        return names
+
+
+    def hindcast(self):
+        '''Observed, predicted and residual water level at the observation times'''
+
+        input_dict1 = self.inputDict1()
+        input_dict2 = self.inputDict2()
+        save_file = input_dict2['save']
+
+        method_dict = {'T Tide':self.ttideAnalyse, 'U Tide':self.utideAnalyse}
+        method = self.methodLabel.text()
+        coef = method_dict[method]()
+
+        ad = input_dict1['depth']
+        at = input_dict1['time']
+        time_num = date2num(at.to_pydatetime())
+
+        result = tide_harmonic.hindcast(coef, method, input_dict2['latitude'], time_num, ad)
+        stats = tide_harmonic.residualStats(at.values, ad, result['residual'])
+
+        hindcast_out = pd.DataFrame({'Time':at, 'Observed':ad, 'Predicted':result['prediction'],
+                                     'Residual':result['residual']})
+
+        if self.saveState.text() == 'Save Prediction':
+            self.writeOutput(hindcast_out, save_file, '\t')
+
+        if self.plotState.text() == 'Plot Prediction':
+            self.plotHindcast(hindcast_out)
+
+        self.showResidualDialog(stats)
+
+
+    def plotHindcast(self, hindcast_out):
+        '''Observed, predicted and residual plotter'''
+
+        data_label = 'Predicted Data using ' + self.methodLabel.text()
+
+        fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True, figsize=(10, 7))
+        ax1.plot(hindcast_out['Time'], hindcast_out['Observed'], label='Tide Observation Data')
+        ax1.plot(hindcast_out['Time'], hindcast_out['Predicted'], label=data_label)
+        ax1.set_ylabel('Water Level')
+        ax1.legend(loc='best')
+        ax2.plot(hindcast_out['Time'], hindcast_out['Residual'], color='k', label='Residual')
+        ax2.axhline(0, color='r')
+        ax2.set_xlabel('Time')
+        ax2.set_ylabel('Residual')
+        ax2.legend(loc='best')
+        plt.show()
+
+
+    def showResidualDialog(self, stats):
+        '''Showing residual statistics'''
+
+        text = 'RMS residual: {:.6g}\n'.format(stats['RMS residual'])
+        text += 'Variance explained: {:.2f} %\n'.format(stats['variance explained (%)'])
+        text += '\nLargest surges:\n'
+        for time, value in stats['surges']:
+            text += '{}  {:.4g}\n'.format(pd.Timestamp(time), value)
+        text += '\nLargest setdowns:\n'
+        for time, value in stats['setdowns']:
+            text += '{}  {:.4g}\n'.format(pd.Timestamp(time), value)
+
+        residualInfo = QMessageBox()
+        residualInfo.setWindowTitle('Hindcast Residual')
+        residualInfo.setWindowIcon(QIcon('wave-pngrepo-com.png'))
+        residualInfo.setIcon(QMessageBox.Information)
+        residualInfo.setText(text)
+
+        residualInfo.exec_()
+
+
+    def tidalFilter(self):
+        '''Daily mean sea level and its trend through a tidal filter, with the non-tidal residual'''
+
+        input_dict1 = self.gridInput(self.inputDict1())
+        input_dict2 = self.inputDict2()
+        save_file = input_dict2['save']
+        name = self.filterCB.currentText()
+
+        try:
+            filtered, table, rate = tide_filter.meanSeaLevel(input_dict1['time'], input_dict1['depth'],
+                                                             input_dict1['interval'] / 60, name,
+                                                             self.cutoffSB.value())
+        except ValueError as e:
+            self.filterWarning(str(e))
+            return
+
+        # The non-tidal residual is the observation minus the tide of the station's fit if it was
+        # analysed before, the filter does not start an analysis. Otherwise the filtered series is removed.
+        method = self.methodLabel.text()
+        coef = self.storedFit(method, input_dict1)
+        removed = 'filtered series'
+        residual = input_dict1['depth'] - filtered
+
+        if coef is not None:
+            time_num = date2num(input_dict1['time'].to_pydatetime())
+
+            try:
+                result = tide_harmonic.hindcast(coef, method, input_dict2['latitude'], time_num, input_dict1['depth'])
+                removed = method + ' tide'
+                residual = result['residual']
+            except (ImportError, ValueError) as e:
+                self.filterWarning(str(e), 'Cannot remove the {} tide, the filtered series is removed instead.'.format(
+                    method))
+
+        series_out = pd.DataFrame({'Time':input_dict1['time'], 'Observed':input_dict1['depth'], 'Filtered':filtered,
+                                   'Residual':residual})
+
+        if self.saveState.text() == 'Save Prediction':
+            self.writeOutput(table.reset_index(), save_file, '\t')
+            self.writeOutput(series_out, os.path.splitext(save_file)[0] + '.series.txt', '\t')
+
+        if self.plotState.text() == 'Plot Prediction':
+            self.plotFilter(series_out, table, name)
+
+        self.showFilterDialog(table, series_out, rate, name, removed)
+
+
+    def plotFilter(self, series_out, table, name):
+        '''Observed, filtered, daily mean sea level and non-tidal residual plotter'''
+
+        fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True, figsize=(10, 7))
+        ax1.plot(series_out['Time'], series_out['Observed'], color='0.8', label='Tide Observation Data')
+        ax1.plot(series_out['Time'], series_out['Filtered'], label=name + ' Filtered')
+        ax1.plot(table.index, table['MSL'], '.', markersize=3, label='Daily MSL')
+        ax1.plot(table.index, table['Trend'], color='r', label='Trend')
+        ax1.set_ylabel('Water Level')
+        ax1.legend(loc='best')
+        ax2.plot(series_out['Time'], series_out['Residual'], color='g', linewidth=0.5, label='Non-tidal Residual')
+        ax2.plot(table.index, table['MSL_detrended'], color='k', label='Daily MSL about the Trend')
+        ax2.axhline(0, color='r')
+        ax2.set_xlabel('Time')
+        ax2.set_ylabel('Residual')
+        ax2.legend(loc='best')
+        plt.show()
+
+
+    def showFilterDialog(self, table, series_out, rate, name, removed):
+        '''Showing mean sea level, trend and residual spread'''
+
+        days = table['MSL'].notna()
+        text = '{} filter, {} of {} days with mean sea level\n\n'.format(name, days.sum(), len(table))
+        text += 'Mean sea level: {:.4f}\n'.format(table['MSL'].mean())
+        text += 'Trend: {:.4f} per year\n'.format(rate)
+        text += 'Daily MSL about the trend, standard deviation: {:.4f}\n'.format(table['MSL_detrended'].std())
+        text += 'Non-tidal residual ({} removed), standard deviation: {:.4f}\n'.format(
+            removed, series_out['Residual'].std())
+
+        filterInfo = QMessageBox()
+        filterInfo.setWindowTitle('Tidal Filter')
+        filterInfo.setWindowIcon(QIcon('wave-pngrepo-com.png'))
+        filterInfo.setIcon(QMessageBox.Information)
+        filterInfo.setText(text)
+
+        filterInfo.exec_()
+
+
+    def tideTable(self):
+        '''High and low water times and heights between the start and end dates'''
+
+        input_dict2 = self.inputDict2()
+        save_file = input_dict2['save']
+
+        method_dict = {'T Tide':self.ttideAnalyse, 'U Tide':self.utideAnalyse}
+        method = self.methodLabel.text()
+        model = self.harmonicModel(method_dict[method](), method)
+
+        time = input_dict2['predicted time']
+        start, end = date2num([time[0].to_pydatetime(), time[-1].to_pydatetime()])
+        times, heights, high = tide_harmonic.tideTable(model, start, end)
+
+        table_out = pd.DataFrame({'Time':pd.to_datetime(num2date(times)).tz_localize(None).round('s'),
+                                  'Height':heights, 'Type':np.where(high, 'High', 'Low')})
+
+        if self.saveState.text() == 'Save Prediction':
+            self.writeOutput(table_out, save_file, '\t')
+
+        if self.plotState.text() == 'Plot Prediction':
+            self.plotTideTable(table_out)
+
+        if self.saveState.text() == 'unchecked' and self.plotState.text() == 'unchecked':
+            self.showPredicDialog(table_out)
+
+
+    def plotTideTable(self, table_out):
+        '''High and low water plotter'''
+
+        high = table_out['Type'] == 'High'
+
+        plt.figure(figsize=(10, 5))
+        plt.plot(table_out['Time'], table_out['Height'], color='0.7')
+        plt.plot(table_out['Time'][high], table_out['Height'][high], '^', label='High Water')
+        plt.plot(table_out['Time'][~high], table_out['Height'][~high], 'v', label='Low Water')
+        plt.xlabel('Time')
+        plt.ylabel('Water Level')
+        plt.legend(loc='best')
+        plt.show()
+
+
+    def monitor(self):
+        '''Observed, predicted and residual water level of a logger file while it is being written'''
+
+        home_dir = str(Path.home())
+        fname = QFileDialog.getOpenFileName(self, 'Monitor File', home_dir)[0]
+
+        if fname == '':
+            return
+
+        # The file is read with the columns the station is analysed with.
+        time = self.timeHeaderCB.currentText()
+        depth = self.depthHeaderCB.currentText()
+        layout = self.seriesLayout(fname, time, depth)
+
+        if layout is None:
+            return
+
+        dayF = self.str2bool(self.dayFirstCB.currentText())
+
+        method_dict = {'T Tide':self.ttideAnalyse, 'U Tide':self.utideAnalyse}
+        method = self.methodLabel.text()
+        model = self.harmonicModel(method_dict[method](), method)
+
+        if self.monitorState is not None:
+            self.monitorState['timer'].stop()
+
+        fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True, figsize=(10, 7))
+        lines = {'Observed':ax1.plot([], [], label='Observed')[0],
+                 'Predicted':ax1.plot([], [], label='Predicted using ' + method)[0],
+                 'Residual':ax2.plot([], [], color='g', label='Residual')[0]}
+        ax1.set_title(os.path.basename(fname))
+        ax1.set_ylabel('Water Level')
+        ax1.legend(loc='upper left')
+        ax2.axhline(0, color='k', linewidth=0.5)
+        ax2.set_xlabel('Time')
+        ax2.set_ylabel('Residual')
+
+        # Only the records appended since the last refresh are parsed and predicted.
+        timer = QTimer()
+        timer.timeout.connect(self.monitorUpdate)
+        fig.canvas.mpl_connect('close_event', lambda event: timer.stop())
+
+        self.monitorState = {'tail':tide_io.FileTail(fname, layout['sep'], layout['header'], layout['data_start'],
+                                                     time, depth, dayF),
+                             'series':tide_data.RingSeries(MONITOR_SAMPLES, lines), 'model':model,
+                             'figure':fig, 'axes':(ax1, ax2), 'lines':lines, 'timer':timer}
+
+        self.monitorUpdate()
+        timer.start(MONITOR_REFRESH)
+        plt.show(block=False)
+
+
+    def monitorUpdate(self):
+        '''Append new records of the monitored file and redraw the last MONITOR_SAMPLES'''
+
+        state = self.monitorState
+        times, depths = state['tail'].read()
+
+        if len(times) == 0:
+            return
+
+        predicted = tide_harmonic.synthesize(state['model'], date2num(times))
+        series = state['series']
+        series.extend(times, Observed=depths, Predicted=predicted, Residual=depths - predicted)
+
+        time = series.view()
+
+        for name, line in state['lines'].items():
+            line.set_data(time, series.view(name))
+
+        for ax in state['axes']:
+            ax.relim()
+            ax.autoscale_view()
+
+        state['figure'].canvas.draw_idle()
+
+
+    def predictTimes(self):
+        '''Water level at every timestamp of a (large) file written alongside its columns'''
+
+        home_dir = str(Path.home())
+        fname = QFileDialog.getOpenFileName(self, 'Predict at Times', home_dir)[0]
+
+        if fname == '':
+            return
+
+        layout = tide_io.sniffFile(fname)
+        dtypes = layout['dtypes'] if layout is not None else {}
+        time_cols = [c for c, t in dtypes.items() if t == 'datetime']
+
+        if len(time_cols) == 0:
+            self.loadWarning([fname + ': no time column found.'])
+            return
+
+        dayF = self.str2bool(self.dayFirstCB.currentText())
+
+        method_dict = {'T Tide':self.ttideAnalyse, 'U Tide':self.utideAnalyse}
+        method = self.methodLabel.text()
+        model = self.harmonicModel(method_dict[method](), method)
+
+        # Chunks are parsed, predicted and written one at a time, the file is never held whole.
+        records = tide_io.streamRecords(fname, layout['sep'], layout['header'], layout['data_start'],
+                                        time_cols[0], dayF, self.streamBudget)
+        save_file = tide_io.siblingPath(fname, '_tide')
+
+        start = perf_counter()
+        rows = tide_io.writeRecords(tide_harmonic.predictRecords(model, records), save_file, layout['sep'],
+                                    layout['header'])
+        elapsed = perf_counter() - start
+
+        timesInfo = QMessageBox()
+        timesInfo.setWindowTitle('Predict at Times')
+        timesInfo.setWindowIcon(QIcon('wave-pngrepo-com.png'))
+        timesInfo.setIcon(QMessageBox.Information)
+        timesInfo.setText('{} times predicted using {} in {:.1f} s ({:,.0f} per second)\n\nSaved to {}'.format(
+            rows, method, elapsed, rows / max(elapsed, 1e-9), save_file))
+
+        timesInfo.exec_()
+
+
+    def datums(self):
+        '''Tidal datums from a nodal cycle of prediction starting at the start date'''
+
+        input_dict2 = self.inputDict2()
+        save_file = input_dict2['save']
+
+        method_dict = {'T Tide':self.ttideAnalyse, 'U Tide':self.utideAnalyse}
+        method = self.methodLabel.text()
+        model = self.harmonicModel(method_dict[method](), method)
+
+        start = date2num(input_dict2['predicted time'][0].to_pydatetime())
+        levels = tide_harmonic.datums(model, start)
+        datum_out = pd.DataFrame({'Datum':list(levels), 'Level':list(levels.values())})
+
+        if self.saveState.text() == 'Save Prediction':
+            self.writeOutput(datum_out, save_file, '\t')
+
+        self.showDatumDialog(levels)
+
+
+    def showDatumDialog(self, levels):
+        '''Showing tidal datums'''
+
+        text = 'Tidal datums over {} years, {} method\n\n'.format(tide_harmonic.DATUM_YEARS, self.methodLabel.text())
+        for name, level in levels.items():
+            text += '{:<6}{:.4f}\n'.format(name, level)
+
+        datumInfo = QMessageBox()
+        datumInfo.setWindowTitle('Tidal Datums')
+        datumInfo.setWindowIcon(QIcon('wave-pngrepo-com.png'))
+        datumInfo.setIcon(QMessageBox.Information)
+        datumInfo.setText(text)
+
+        datumInfo.exec_()
+
+
+    def cachedFit(self, key, fit):
+        '''Fitted coefficients of the current station, computed once per selection'''
+
+        if self.station is None:
+            return fit()
+
+        fits = self.station['results'].setdefault('fits', {})
+
+        if key not in fits:
+            fits[key] = fit()
+
+        return fits[key]
+
+
+    def fitKey(self, method, input_dict1):
+        '''Constituents to fit by method and the key of the fit in the current station's results'''
+
+        names = self.constituents(input_dict1)
+
+        if names is not None and method == 'T Tide':
+            names = tide_const.ttideNames(names)
+
+        key = (method, input_dict1['key'], self.inputDict2()['latitude'], names if names is None else tuple(names))
+
+        return key, names
+
+
+    def storedFit(self, method, input_dict1):
+        '''Fitted coefficients of the current station by method if analysed before, else None'''
+
+        if self.station is None:
+            return None
+
+        key, names = self.fitKey(method, input_dict1)
+
+        return self.station['results'].get('fits', {}).get(key)
+
+
+    def harmonicModel(self, coef, method):
+        '''Harmonic model of fitted coefficients, T Tide referenced to the record center'''
+
+        at = self.inputDict1()['time']
+        time_num = date2num([at[0].to_pydatetime(), at[-1].to_pydatetime()])
+        latitude = self.inputDict2()['latitude']
+
+        return tide_harmonic.harmonicModel(coef, method, latitude, 0.5 * (time_num[0] + time_num[1]))
+
+
+    def tilePrediction(self, coef, method, time_predic):
+        '''Prediction assembled from cached tiles, only tiles not predicted before are synthesized'''
+
+        model = self.harmonicModel(coef, method)
+        predic = self.tileCache.predict(model, tide_harmonic.modelKey(model), time_predic)
+
+        self.predicButton.setToolTip('Prediction cache: {tiles} tiles, hit rate {hit rate (%):.0f}%'.format(
+            **self.tileCache.stats()))
+
+        return predic
+
+
     def ttideAnalyse(self):
         '''T Tide Analysis processing'''
 
-        input_dict1 = self.inputDict1()
+        input_dict1 = self.gridInput(self.inputDict1())
         input_dict2 = self.inputDict2()
         ad = input_dict1['depth']
         at = input_dict1['time']
         latitude = input_dict2['latitude']
         time_diff = input_dict1['interval'] / 60
         time_num = date2num(at.to_pydatetime())
-
-        coef = t_tide(ad, dt=time_diff, stime=time_num[0], lat=latitude, synth=0)
+        key, names = self.fitKey('T Tide', input_dict1)
+        coef = self.cachedFit(key, lambda: tide_solve.ttideSolve(ad, time_diff, time_num[0], latitude, names))
 
         return coef
 
@@ -595,11 +1280,10 @@ class TideWidget(QWidget):
         input_dict2 = self.inputDict2()
 
         time_predic = input_dict2['predicted time']
-        time_predic_num = date2num(time_predic.to_pydatetime())
 
         coef = self.ttideAnalyse()
         msl = coef['z0']
-        predic = coef(time_predic_num) + msl
+        predic = self.tilePrediction(coef, 'T Tide', time_predic)
 
         return {'prediction':predic, 'MSL':msl}
 
@@ -614,8 +1298,12 @@ class TideWidget(QWidget):
 
         time_num = date2num(at.to_pydatetime())
         latitude = input_dict2['latitude']
+        key, names = self.fitKey('U Tide', input_dict1)
 
-        coef = solve(time_num, ad, lat=latitude, trend=False, method='robust')
+        if names is None:
+            names = 'auto'
+
+        coef = self.cachedFit(key, lambda: tide_solve.utideSolve(time_num, ad, latitude, names))
 
         return coef
 
@@ -626,15 +1314,118 @@ class TideWidget(QWidget):
         input_dict2 = self.inputDict2()
 
         time_predic = input_dict2['predicted time']
-        time_predic_num = date2num(time_predic.to_pydatetime())
 
         coef = self.utideAnalyse()
         msl = coef.mean
-        predic = reconstruct(time_predic_num, coef, min_SNR=0)
+        predic = self.tilePrediction(coef, 'U Tide', time_predic)
 
         return {'prediction':predic, 'MSL':msl}
 
 
+    def compare(self):
+        '''T Tide and U Tide analysis and prediction running concurrently on the same prepared series'''
+
+        input_dict1 = self.inputDict1()
+        input_dict2 = self.inputDict2()
+        save_file = input_dict2['save']
+
+        ad = input_dict1['depth']
+        at = input_dict1['time']
+        latitude = input_dict2['latitude']
+        time_diff = input_dict1['interval'] / 60
+        time_num = date2num(at.to_pydatetime())
+        names = self.constituents(input_dict1)
+
+        grid_depth = self.gridInput(input_dict1)['depth']
+
+        time = input_dict2['predicted time']
+        time_predic_num = date2num(time.to_pydatetime())
+
+        if names is None:
+            ttide_names, utide_names = None, 'auto'
+        else:
+            ttide_names, utide_names = tide_const.ttideNames(names), names
+
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            ttide_future = pool.submit(tide_solve.ttideRun, grid_depth, time_diff, time_num[0], latitude,
+                                       ttide_names, time_predic_num)
+            utide_future = pool.submit(tide_solve.utideRun, time_num, ad, latitude, utide_names,
+                                       time_predic_num)
+            ttide_result = ttide_future.result()
+            utide_result = utide_future.result()
+
+        table = tide_solve.compareTables(tide_solve.constituentTable(ttide_result['coef'], 'T Tide'),
+                                         tide_solve.constituentTable(utide_result['coef'], 'U Tide'))
+        stats = tide_solve.compareStats(ttide_result['prediction'], utide_result['prediction'])
+
+        predic_out = pd.DataFrame({'Time':time, 'T Tide':ttide_result['prediction'],
+                                   'U Tide':utide_result['prediction']})
+        predic_out['Difference'] = predic_out['U Tide'] - predic_out['T Tide']
+
+        if self.saveState.text() == 'Save Prediction':
+            self.writeOutput(predic_out, save_file, '\t')
+
+        if self.plotState.text() == 'Plot Prediction':
+            self.plotCompare(predic_out, ttide_result['MSL'], utide_result['MSL'])
+
+        self.showCompareDialog(table, stats)
+
+
+    def plotCompare(self, predic_out, ttide_msl, utide_msl):
+        '''T Tide and U Tide prediction plotter'''
+
+        fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True, figsize=(10, 7))
+        ax1.plot(predic_out['Time'], predic_out['T Tide'], label='Predicted Data using T Tide')
+        ax1.plot(predic_out['Time'], predic_out['U Tide'], label='Predicted Data using U Tide')
+        ax1.axhline(ttide_msl, color='r', label='T Tide MSL = ' + str(ttide_msl))
+        ax1.axhline(utide_msl, color='m', label='U Tide MSL = ' + str(utide_msl))
+        ax1.set_ylabel('Water Level')
+        ax1.legend(loc='best')
+        ax2.plot(predic_out['Time'], predic_out['Difference'], color='k', label='U Tide - T Tide')
+        ax2.set_xlabel('Time')
+        ax2.set_ylabel('Difference')
+        ax2.legend(loc='best')
+        plt.show()
+
+
+    def showCompareDialog(self, table, stats):
+        '''Showing constituents of both methods side by side'''
+
+        showCompare = QDialog()
+        showCompare.setWindowTitle('T Tide and U Tide Comparison')
+        showCompare.setWindowIcon(QIcon('wave-pngrepo-com.png'))
+        showCompare.resize(720, 720)
+        closeButton = QPushButton('Close')
+        closeButton.clicked.connect(showCompare.close)
+
+        statsText = ''
+        for key, value in stats.items():
+            statsText += key + ': ' + '{:.6g}'.format(value) + '\n'
+        statsLabel = QLabel(statsText)
+
+        data = table.reset_index()
+        tableWidget = QTableWidget()
+        tableWidget.setColumnCount(len(data.columns))
+        tableWidget.setRowCount(len(data.index))
+
+        for h in range(len(data.columns)):
+            tableWidget.setHorizontalHeaderItem(h, QTableWidgetItem(data.columns[h]))
+
+        for i in range(len(data.index)):
+            for j in range(len(data.columns)):
+                tableWidget.setItem(i, j, QTableWidgetItem(str(data.iloc[i, j])))
+
+        tableWidget.resizeColumnsToContents()
+
+        grid = QGridLayout()
+        grid.addWidget(statsLabel, 1, 1, 1, 4)
+        grid.addWidget(tableWidget, 2, 1, 25, 4)
+        grid.addWidget(closeButton, 27, 4, 1, 1)
+        showCompare.setLayout(grid)
+
+        showCompare.exec_()
+
+
     def zeroWarning(self):
 
         zeroWarning = QMessageBox()
@@ -645,6 +1436,50 @@ class TideWidget(QWidget):
         zeroWarning.exec_()
 
 
+    def spectrumWarning(self):
+
+        spectrumWarning = QMessageBox()
+        spectrumWarning.setWindowTitle('Warning')
+        spectrumWarning.setIcon(QMessageBox.Critical)
+        spectrumWarning.setText('No {:.0f} day window holds {:.0%} of its records, cannot compute a spectrum.'.format(
+            tide_harmonic.SPECTRUM_SEGMENT, tide_harmonic.SPECTRUM_COVERAGE))
+
+        spectrumWarning.exec_()
+
+
+    def coefficientWarning(self, message):
+
+        coefficientWarning = QMessageBox()
+        coefficientWarning.setWindowTitle('Warning')
+        coefficientWarning.setIcon(QMessageBox.Critical)
+        coefficientWarning.setText('Cannot read coefficients, select a report or model file saved by "Analyse Tide".')
+        coefficientWarning.setDetailedText(message)
+
+        coefficientWarning.exec_()
+
+
+    def filterWarning(self, message, text='Cannot apply the tidal filter to this series.'):
+
+        filterWarning = QMessageBox()
+        filterWarning.setWindowTitle('Warning')
+        filterWarning.setIcon(QMessageBox.Critical)
+        filterWarning.setText(text)
+        filterWarning.setDetailedText(message)
+
+        filterWarning.exec_()
+
+
+    def formatWarning(self, message):
+
+        formatWarning = QMessageBox()
+        formatWarning.setWindowTitle('Warning')
+        formatWarning.setIcon(QMessageBox.Critical)
+        formatWarning.setText('Output format is not available, install its python module or select "Text".')
+        formatWarning.setDetailedText(message)
+
+        formatWarning.exec_()
+
+
     def showPredicDialog(self, data):
         '''Showing prediction data in a form of table'''
 